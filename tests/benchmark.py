@@ -0,0 +1,141 @@
+"""
+Compare timings of vectorized vino conversions against their legacy
+implementations (see `legacy` module).
+
+Usage, from the vino source directory:
+
+    PYTHONPATH=. python tests/benchmark.py [name ...]
+"""
+from __future__ import annotations
+
+import sys
+import timeit
+
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+import vino as vn
+
+import legacy
+
+
+SAMPLES_PATH = Path(__file__).resolve().parent.parent / "samples"
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Any]
+    baseline: Callable[[Any], Any]
+    current: Callable[[Any], Any]
+
+
+def load_sample(path: str, *files: str) -> vn.Vino:
+    return vn.load(*[SAMPLES_PATH / path / f for f in files])
+
+
+def lake_regulargrid() -> vn.RegularGrid:
+    return load_sample("lake", "2D.txt", "2D_metadata.txt").to_regulargrid(ppa=2001)
+
+
+def lake_sample() -> vn.BarGrid:
+    return load_sample("lake", "2D.txt", "2D_metadata.txt")
+
+
+def lake_bargrid() -> vn.BarGrid:
+    return load_sample("lake", "2D.txt", "2D_metadata.txt").to_bargrid(ppa=2001)
+
+
+def cylinder_bargrid() -> vn.BarGrid:
+    return load_sample("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt")
+
+
+def cylinder_regulargrid() -> vn.RegularGrid:
+    return cylinder_bargrid().to_regulargrid()
+
+
+def lake_kdtree() -> vn.KdTree:
+    return load_sample("lake", "lake_Isa_R1.dat", "lake_Isa_R1.txt")
+
+
+def lake4d_kdtree() -> vn.KdTree:
+    return load_sample("4d", "lake4D16.dat", "lake4D16.txt")
+
+
+benchmarks = [
+    Benchmark(
+        "lake_to_bargrid",
+        lake_regulargrid,
+        legacy.regulargrid_to_bargrid,
+        lambda grid: grid.to_bargrid(),
+    ),
+    Benchmark(
+        "4d_cylinder_to_bargrid",
+        cylinder_regulargrid,
+        legacy.regulargrid_to_bargrid,
+        lambda grid: grid.to_bargrid(),
+    ),
+    Benchmark(
+        "lake_to_regulargrid",
+        lake_bargrid,
+        legacy.bargrid_to_regulargrid,
+        lambda bars: bars.to_regulargrid(),
+    ),
+    Benchmark(
+        "4d_cylinder_to_regulargrid",
+        cylinder_bargrid,
+        legacy.bargrid_to_regulargrid,
+        lambda bars: bars.to_regulargrid(),
+    ),
+    Benchmark(
+        "lake_resample",
+        lake_sample,
+        lambda bars: legacy.bargrid_to_bargrid(bars, ppa=1001),
+        lambda bars: bars.to_bargrid(ppa=1001),
+    ),
+    Benchmark(
+        "4d_cylinder_resample",
+        cylinder_bargrid,
+        lambda bars: legacy.bargrid_to_bargrid(bars, ppa=41),
+        lambda bars: bars.to_bargrid(ppa=41),
+    ),
+    Benchmark(
+        "lake_kdtree_to_regulargrid",
+        lake_kdtree,
+        lambda kdtree: legacy.kdtree_to_regulargrid(kdtree, ppa=1001),
+        lambda kdtree: kdtree.to_regulargrid(ppa=1001),
+    ),
+    Benchmark(
+        "4d_lake_kdtree_to_regulargrid",
+        lake4d_kdtree,
+        lambda kdtree: legacy.kdtree_to_regulargrid(kdtree, ppa=40),
+        lambda kdtree: kdtree.to_regulargrid(ppa=40),
+    ),
+    Benchmark(
+        "4d_lake_kdtree_to_bargrid",
+        lake4d_kdtree,
+        lambda kdtree: kdtree.to_bargrid(ppa=80, sparse=False),
+        lambda kdtree: kdtree.to_bargrid(ppa=80),
+    ),
+]
+
+
+def measure(func: Callable[[Any], Any], arg: Any, repeat: int = 3) -> float:
+    timer = timeit.Timer(lambda: func(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(names: list[str]) -> None:
+    selected = [b for b in benchmarks if not names or b.name in names]
+    for bench in selected:
+        arg = bench.setup()
+        baseline = measure(bench.baseline, arg)
+        current = measure(bench.current, arg)
+        print(
+            f"{bench.name:<32} legacy {baseline*1000:10.2f} ms   "
+            f"current {current*1000:10.2f} ms   x{baseline/current:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,156 @@
+"""
+Reference implementations of vino conversions as they were written before
+being vectorized. They are kept as oracles for regression tests and as
+baselines for benchmarks, don't use them anywhere else.
+"""
+from __future__ import annotations
+
+from unittest import mock
+
+import numpy as np
+import numpy.lib.recfunctions as rfn
+
+import vino as vn
+
+from vino.core.vino.regulargrid import grid_positions
+from vino.core.vino.utils import asrecords
+
+
+def regulargrid_to_bargrid(grid: vn.RegularGrid, baraxis: int = -1) -> np.ndarray:
+    baraxis = 0 if baraxis < 0 else baraxis
+
+    new_axes = [a for a in range(grid.dim) if a != baraxis] + [baraxis, baraxis]
+    new_pos_axes = new_axes[:-2]
+
+    permuted_grid = np.moveaxis(grid, baraxis, grid.dim-1) if baraxis != grid.dim-1 else grid
+
+    bars: list[tuple[int, ...]] = []
+
+    for pos in grid_positions(grid.ppa[new_pos_axes]):
+        pos_tuple = tuple(pos)
+        row = permuted_grid[pos_tuple]
+
+        bar_at_end = row[-1]
+        bars_loc_len = len(row) + (1 if bar_at_end else 0)
+        bars_loc = np.empty(bars_loc_len, dtype=bool)
+        bars_loc[0] = row[0]
+        np.not_equal(row[:-1], row[1:], out=bars_loc[1:len(row)])
+        if bar_at_end:
+            bars_loc[-1] = len(row)
+
+        bars_pos = np.nonzero(bars_loc)[0]
+        bars_len = np.diff(bars_pos.reshape(-1, 2), axis=1).ravel()
+        bars.extend(
+            (pos_tuple + (b0, b0+bs-1))
+            for b0, bs in zip(bars_pos[::2], bars_len)
+        )
+
+    return np.array(bars, dtype=vn.BarGrid.DTYPE)
+
+
+def bargrid_to_regulargrid(bars: vn.BarGrid) -> np.ndarray:
+    bar_indices = list(bars.indices_min())
+    grid = np.full(bars.ppa, False)
+
+    for bar in bars:
+        bar_min, bar_max = bar[-2], bar[-1]+1
+        index = bar[bar_indices].tolist()
+        index[bars.baraxis] = slice(bar_min, bar_max)
+        grid[tuple(index)] = True
+
+    return grid
+
+
+def _bars_merge(bar_a: np.ndarray, bar_b: np.ndarray) -> tuple[int, int] | None:
+    a0, a1 = bar_a[-2], bar_a[-1]+1
+    b0, b1 = bar_b[-2], bar_b[-1]+1
+    if a0 <= b0 <= a1 or a0 <= b1 <= a1 or b0 <= a0 <= b0 or b0 <= a1 <= b1:
+        return (min(a0, b0), max(a1, b1)-1)
+    return None
+
+
+def bargrid_resample(
+    data: vn.BarGrid,
+    axes: list[int],
+    cols: list[str],
+    old_origin, old_unit, old_positions,
+    new_origin, new_unit, new_positions
+) -> np.ndarray:
+
+    assert np.issubdtype(data.dtype, np.integer)
+
+    # Sort all bars in lexical order (first by column 0, then 1, 2, etc.)
+    old_bars_rec = asrecords(data, cols)
+    old_bars_rec.sort()
+    old_bars = rfn.structured_to_unstructured(old_bars_rec, copy=False)
+
+    # Convert all bars from old grid coordinates to new grid coordinates
+    new_bars = (
+        (old_origin[axes] + old_bars * old_unit[axes] - new_origin[axes]) / new_unit[axes]
+    ).round().astype(old_bars.dtype)
+
+    # Build structured array views of old bars and old grid positions
+    # to be able to do a fast search in old bars with `searchsorted` method
+    pos_cols = cols[:-2]
+    pos_axes = range(len(pos_cols))
+    old_bars_positions = asrecords(old_bars[:, pos_axes], pos_cols)
+    old_positions_rec = asrecords(old_positions, pos_cols)
+
+    # New bars list
+    bars = []
+
+    # Iterate over indices of the new grid expressed in old grid coordinates
+    for new_pos, old_pos_rec in zip(new_positions, old_positions_rec):
+        idx = old_bars_positions.searchsorted(old_pos_rec)
+        new_batch: list[np.ndarray] = []
+
+        # Iterate over bars at current position
+        while idx < len(old_bars) and np.all(old_bars_positions[idx] == old_pos_rec):
+            new_bar = np.concatenate((new_pos, new_bars[idx][-2:]))
+            idx += 1
+
+            merge = None
+
+            # Already have bars to add at current position?
+            if new_batch:
+                # Skip duplicates
+                if np.all(new_bar == new_batch[-1]):
+                    continue
+
+                # Try to merge the new bar with the last one
+                merge = _bars_merge(new_batch[-1], new_bar)
+                if merge is not None:
+                    new_batch[-1][-2:] = merge
+
+            # Otherwise, add the new bar
+            if merge is None:
+                new_batch.append(new_bar)
+
+        # Finalize by adding current batch to new bars list
+        bars.extend(new_batch)
+
+    if not bars:
+        return np.empty((0, data.shape[1]), dtype=old_bars.dtype)
+
+    return np.array(bars, dtype=old_bars.dtype)
+
+
+def bargrid_to_bargrid(bars: vn.BarGrid, ppa: int) -> vn.BarGrid:
+    with mock.patch.object(vn.BarGrid, '_resample', staticmethod(bargrid_resample)):
+        return bars.to_bargrid(ppa=ppa)
+
+
+def kdtree_to_regulargrid(kdtree: vn.KdTree, ppa: int) -> np.ndarray:
+    ppa = np.array([ppa] * kdtree.dim)
+
+    bounds = kdtree.bounds
+    unit = (bounds[1] - bounds[0]) / ppa
+
+    cells_min_int = np.floor((kdtree.cells_min() - bounds[0] + unit/2) / unit).astype(int)
+    cells_max_int = np.round((kdtree.cells_max() - bounds[0] - unit/2) / unit).astype(int) + 1
+
+    grid = np.full(ppa, False)
+    for cmin, cmax in zip(cells_min_int, cells_max_int):
+        grid[tuple(slice(cmin[a], cmax[a]) for a in range(kdtree.dim))] = True
+
+    return grid
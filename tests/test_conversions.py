@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import pytest
+import numpy as np
+
+from pathlib import Path
+from scipy import ndimage  # type: ignore
+
+import vino as vn
+
+from vino.core.vino.kdtree import cells_to_bars
+from vino.core.vino.regulargrid import bounded_distance_transform, distance_blocks, line_distance_transform
+
+import legacy
+
+
+SAMPLES_PATH = "samples"
+
+
+def load_sample(path, *files):
+    return vn.load(*[Path(SAMPLES_PATH) / path / f for f in files])
+
+
+def random_grid(shape, density=0.4, seed=0):
+    rng = np.random.default_rng(seed)
+    grid = rng.random(shape) < density
+    metadata = vn.Metadata({
+        'resultformat.title': 'regulargrid',
+        'PointNumberPerAxis': tuple(s - 1 for s in shape),
+        'MinimalValues': tuple(0. for _ in shape),
+        'MaximalValues': tuple(float(s - 1) for s in shape),
+    })
+    return vn.RegularGrid(grid, metadata)
+
+
+grids = [
+    pytest.param(random_grid((7, 5)), id="random_2d"),
+    pytest.param(random_grid((4, 6, 5), density=0.7, seed=1), id="random_3d"),
+    pytest.param(random_grid((3, 4, 2, 5), density=0.5, seed=2), id="random_4d"),
+    pytest.param(random_grid((6, 6), density=1.), id="full"),
+    pytest.param(random_grid((5, 3, 4), density=0.), id="empty"),
+]
+
+
+@pytest.mark.parametrize("grid", grids)
+def test_regulargrid_to_bargrid(grid):
+    for baraxis in range(grid.dim):
+        expected = legacy.regulargrid_to_bargrid(grid, baraxis=baraxis)
+        bars = grid.to_bargrid(baraxis=baraxis)
+
+        assert bars.dtype == vn.BarGrid.DTYPE
+        assert np.asarray(bars).reshape(-1).tobytes() == expected.tobytes()
+
+
+def test_regulargrid_to_bargrid_sample():
+    grid = load_sample("lake", "2D_light.txt", "2D_light_metadata.txt").to_regulargrid(ppa=301)
+    expected = legacy.regulargrid_to_bargrid(grid)
+
+    assert np.array_equal(grid.to_bargrid(), expected)
+
+
+bargrids = [
+    pytest.param(("lake", "2D_light.txt", "2D_light_metadata.txt"), 201, id="lake_light"),
+    pytest.param(("lake", "2D.txt", "2D_metadata.txt"), 301, id="lake"),
+    pytest.param(("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt"), -1, id="4d_cylinder"),
+]
+
+
+@pytest.mark.parametrize("location, ppa", bargrids)
+def test_bargrid_to_regulargrid(location, ppa):
+    bars = load_sample(*location)
+    if ppa != -1:
+        bars = bars.to_bargrid(ppa=ppa)
+    grid = bars.to_regulargrid()
+
+    assert grid.dtype == np.bool_
+    assert np.array_equal(grid, legacy.bargrid_to_regulargrid(bars))
+
+
+def test_bargrid_to_regulargrid_weights():
+    bars = random_grid((6, 7, 5), density=0.6).to_bargrid(baraxis=1)
+    doubled = vn.BarGrid(np.concatenate((bars, bars)), bars.metadata)
+
+    counts = doubled.to_regulargrid(dtype=np.uint8)
+    assert counts.dtype == np.uint8
+    assert np.array_equal(counts, 2 * bars.to_regulargrid())
+
+    weights = np.arange(len(bars)) / 10
+    weighted = bars.to_regulargrid(dtype=np.float32, weights=weights)
+    assert weighted.has_weight()
+    assert np.all(weighted[~bars.to_regulargrid()] == 0)
+    for bar, w in zip(bars.view(np.ndarray), weights):
+        index = list(bar[list(bars.indices_min())])
+        index[bars.baraxis] = slice(bar[-2], bar[-1]+1)
+        assert np.allclose(weighted[tuple(index)], w)
+
+
+resamplings = [
+    pytest.param(("lake", "2D_light.txt", "2D_light_metadata.txt"), 101, id="lake_light_101"),
+    pytest.param(("lake", "2D.txt", "2D_metadata.txt"), 257, id="lake_257"),
+    pytest.param(("lake", "2D.txt", "2D_metadata.txt"), (40, 3000), id="lake_40_3000"),
+    pytest.param(("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt"), 20, id="4d_cylinder_20"),
+    pytest.param(("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt"), (120, 9, 50, 33), id="4d_cylinder_upsampled"),
+]
+
+
+@pytest.mark.parametrize("location, ppa", resamplings)
+def test_bargrid_resample(location, ppa):
+    bars = load_sample(*location)
+    resampled = bars.to_bargrid(ppa=ppa)
+    expected = legacy.bargrid_to_bargrid(bars, ppa=ppa)
+
+    assert resampled.dtype == expected.dtype
+    assert np.asarray(resampled).tobytes() == np.asarray(expected).tobytes()
+    assert np.all(resampled.ppa == expected.ppa)
+
+
+kdtrees = [
+    pytest.param(("lake", "lake_Isa_R1.dat", "lake_Isa_R1.txt"), 100, id="lake_100"),
+    pytest.param(("lake", "lake_Isa_R1.dat", "lake_Isa_R1.txt"), 333, id="lake_333"),
+    pytest.param(("4d", "lake4D16.dat", "lake4D16.txt"), 16, id="4d_lake_16"),
+    pytest.param(("4d", "lake4D16.dat", "lake4D16.txt"), 25, id="4d_lake_25"),
+]
+
+
+@pytest.mark.parametrize("location, ppa", kdtrees)
+def test_kdtree_to_regulargrid(location, ppa):
+    kdtree = load_sample(*location)
+    grid = kdtree.to_regulargrid(ppa=ppa)
+
+    assert np.array_equal(grid, legacy.kdtree_to_regulargrid(kdtree, ppa))
+
+
+@pytest.mark.parametrize("location, ppa", kdtrees)
+def test_kdtree_to_bargrid(location, ppa):
+    kdtree = load_sample(*location)
+    sparse = kdtree.to_bargrid(ppa=ppa)
+    dense = kdtree.to_bargrid(ppa=ppa, sparse=False)
+
+    assert np.asarray(sparse).tobytes() == np.asarray(dense).tobytes()
+    assert sparse.metadata['ColumnDescription'] == dense.metadata['ColumnDescription']
+    assert np.all(sparse.origin == dense.origin) and np.all(sparse.ppa == dense.ppa)
+
+
+def test_kdtree_to_bargrid_chunks():
+    kdtree = load_sample("4d", "lake4D16.dat", "lake4D16.txt")
+    ppa = np.array([20, 30, 25, 35])
+    _, cells_min, cells_max = kdtree._rasterize(ppa)
+
+    bars = cells_to_bars(cells_min, cells_max, ppa, 0)
+    chunked = cells_to_bars(cells_min, cells_max, ppa, 0, chunk_size=1000)
+
+    assert np.array_equal(chunked, bars)
+    assert np.array_equal(bars, kdtree.to_regulargrid(ppa=ppa).to_bargrid())
+
+
+@pytest.mark.parametrize("grid", grids)
+def test_regulargrid_packed_mask(grid):
+    packed = grid.packed_mask()
+    mask = np.unpackbits(packed, count=grid.size, bitorder='little').astype(bool)
+
+    assert packed.dtype == np.uint8 and len(packed) == -(-grid.size // 8)
+    assert np.array_equal(grid.grid_coordinates()[mask], grid.points_coordinates())
+
+
+@pytest.mark.parametrize("grid", grids)
+def test_regulargrid_points_coordinates(grid):
+    slices = tuple(
+        slice(start, stop, complex(imag=steps))
+        for start, stop, steps in zip(grid.origin, grid.opposite, grid.ppa)
+    )
+    mgrid = np.mgrid[slices].reshape(grid.dim, -1).T
+
+    assert np.allclose(grid.grid_coordinates(), mgrid)
+    assert np.allclose(grid.points_coordinates(), mgrid[grid.ravel()])
+
+    chunks = list(grid.iter_points_coordinates(chunk_size=7))
+    assert all(len(chunk) <= 7 for chunk in chunks)
+    assert np.array_equal(np.concatenate(chunks or [np.empty((0, grid.dim))]), grid.points_coordinates())
+
+
+def sections(grid):
+    dim = grid.dim
+    for plane in ((0, 1), (1, 0), (0, dim - 1), (dim - 1, dim - 2)):
+        fixed = [a for a in range(dim) if a not in plane]
+        for step in (0, 1, 5):
+            yield plane, tuple(step * (i + 1) % grid.ppa[a] for i, a in enumerate(fixed))
+
+
+@pytest.mark.parametrize("grid", [g for g in grids if g.values[0].dim > 2])
+def test_bargrid_section(grid):
+    for baraxis in range(grid.dim):
+        bars = grid.to_bargrid(baraxis=baraxis)
+        for plane, at in sections(grid):
+            assert np.array_equal(bars.section(plane, at), grid.section(plane, at))
+
+
+@pytest.mark.parametrize("location, ppa", [k for k in kdtrees if k.id.startswith("4d")])
+def test_kdtree_section(location, ppa):
+    kdtree = load_sample(*location)
+    grid = kdtree.to_regulargrid(ppa=ppa)
+    for plane, at in sections(grid):
+        assert np.array_equal(kdtree.section(plane, at, ppa), grid.section(plane, at))
+
+
+@pytest.mark.parametrize("grid", [g for g in grids if g.values[0].dim > 2])
+def test_sections(grid):
+    bars = grid.to_bargrid(baraxis=1)
+    for plane, _ in sections(grid):
+        fixed = [a for a in range(grid.dim) if a not in plane]
+        positions = np.indices(grid.ppa[fixed]).reshape(len(fixed), -1).T
+        expected = [grid.section(plane, at) for at in positions]
+
+        assert np.array_equal(grid.sections(plane, positions), expected)
+        assert np.array_equal(bars.sections(plane, positions), expected)
+
+
+@pytest.mark.parametrize("grid", grids + [pytest.param(random_grid((40, 30), density=0.97), id="sparse_holes")])
+def test_regulargrid_with_distance(grid):
+    exact = grid.with_distance()
+    taxicab = grid.with_distance(method='taxicab')
+    chessboard = grid.with_distance(method='chessboard')
+
+    assert exact.dtype == np.float64
+    assert np.array_equal(exact > 0, grid)
+    assert np.all(chessboard <= exact) and np.all(exact <= taxicab)
+
+    for max_distance in (0, 1, 2.5, 100):
+        expected = np.minimum(exact, max_distance)
+        bounded = grid.with_distance(max_distance=max_distance, dtype=np.float32)
+
+        assert bounded.dtype == np.float32
+        assert np.allclose(bounded, expected, rtol=1e-6, atol=0)
+        assert np.array_equal(grid.with_distance(method='taxicab', max_distance=max_distance),
+                              np.minimum(taxicab, max_distance))
+
+
+@pytest.mark.parametrize("shape", [(40,), (20, 30), (18, 13, 25)])
+def test_bounded_distance_transform_blocks(shape):
+    grid = np.pad(random_grid(shape, density=0.95, seed=3), 1)
+    exact = ndimage.distance_transform_edt(grid)
+
+    for max_distance in (0, 1, 3.5, 50):
+        for block_size in (1, 4, 32):
+            bounded = bounded_distance_transform(grid, max_distance, block_size=block_size)
+            assert np.allclose(bounded, np.minimum(exact, max_distance))
+
+    with pytest.raises(AssertionError):
+        bounded_distance_transform(grid, 2, dtype=np.uint8)
+
+
+def test_distance_blocks():
+    grid = np.pad(np.ones((30, 40, 50), dtype=bool), 1)
+    exact = ndimage.distance_transform_edt(grid)
+    max_distance, block_size = 2.5, 4
+
+    squared = line_distance_transform(grid, max_distance, np.float64)
+    covered = np.zeros_like(grid)
+    for block in distance_blocks(grid, squared, max_distance, block_size):
+        assert not covered[block].any()
+        covered[block] = True
+
+    # Blocks cover cells close to False cells, and skip the interior
+    assert np.all(covered[grid & (exact < max_distance)])
+    margin = int(max_distance) + block_size
+    assert not covered[tuple(slice(margin, -margin) for _ in grid.shape)].any()
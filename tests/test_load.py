@@ -8,6 +8,9 @@ from pathlib import Path
 
 import vino as vn
 
+from vino.io.parsers import RichCSVParser, PSPParser
+from vino.io.parsers.csvparser import RowBuffer
+
 
 SAMPLES_PATH = "samples"
 
@@ -134,3 +137,36 @@ def test_load(location, expect):
     assert expect.count is None or len(vino) == expect.count
     assert expect.first is None or np.all(vino[0] == expect.first)
     assert expect.last  is None or np.all(vino[-1] == expect.last)
+
+
+iterparsers = [
+    pytest.param(PSPParser, ("lake", "2D.txt"), 65537, id="lake_psp"),
+    pytest.param(RichCSVParser, ("lake", "lake_Isa_R1.dat"), 6335, id="lake_viabilitree"),
+]
+
+
+@pytest.mark.parametrize("parser, location, count", iterparsers)
+def test_iterparse(parser, location, count):
+    path = Path(SAMPLES_PATH).joinpath(*location)
+    with open(path) as stream:
+        expected = parser().parse(stream)
+    with open(path) as stream:
+        blocks = list(parser().iterparse(stream, block_size=1000))
+
+    assert len(expected) == count
+    assert len(blocks) == -(-count // 1000)
+    assert all(len(b) <= 1000 for b in blocks)
+    assert all(b.metadata == expected.metadata for b in blocks)
+    assert np.array_equal(np.concatenate(blocks), expected)
+
+
+def test_row_buffer():
+    buffer = RowBuffer(capacity=2)
+    buffer.append(np.arange(6).reshape(3, 2))
+    buffer.append(np.array([[6.5, 7]]))
+    buffer.append(np.empty((0, 2), dtype=int))
+    array = buffer.to_numpy()
+
+    assert array.dtype == np.float64
+    assert array.flags.owndata
+    assert np.array_equal(array, [[0, 1], [2, 3], [4, 5], [6.5, 7]])
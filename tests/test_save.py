@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import pytest
+import numpy as np
+
+from pathlib import Path
+
+import vino as vn
+
+from vino.io.load import guess_format
+
+
+SAMPLES_PATH = "samples"
+
+
+def load_sample(path, *files):
+    return vn.load(*[Path(SAMPLES_PATH) / path / f for f in files])
+
+
+def is_memory_mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+
+samples = [
+    pytest.param(("lake", "2D_light.txt", "2D_light_metadata.txt"), id="lake_psp_light"),
+    pytest.param(("lake", "lake_Isa_R1.dat", "lake_Isa_R1.txt"), id="lake_viabilitree"),
+    pytest.param(("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt"), id="4d_cylinder"),
+    pytest.param(("polygon", "LV.dat", "LV_metadata.txt"), id="LV"),
+]
+
+
+@pytest.mark.parametrize("location", samples)
+def test_save_npy_mmap(location, tmp_path):
+    vino = load_sample(*location)
+    vn.save_npy(tmp_path / "data.npy", vino)
+    vn.save_metadata(tmp_path / "metadata.txt", vino.metadata)
+
+    data = vn.load_npy(tmp_path / "data.npy", mmap_mode='r')
+    loaded = vn.Vino(data, vn.load_metadata(tmp_path / "metadata.txt"))
+
+    assert isinstance(data, np.memmap)
+    assert type(loaded) is type(vino)
+    assert loaded.metadata == vino.metadata
+    assert np.array_equal(loaded, vino)
+
+
+def test_save_npy_mmap_regulargrid(tmp_path):
+    grid = load_sample("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt").to_regulargrid()
+    vn.save_npy(tmp_path / "data.npy", grid)
+
+    data = vn.load_npy(tmp_path / "data.npy", mmap_mode='r')
+    loaded = vn.Vino(data, grid.metadata)
+
+    assert not loaded.flags.writeable
+    assert loaded.shape == grid.shape
+    assert np.array_equal(loaded, grid)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 1e-6), ("uint16", 1e-3)])
+def test_save_npy_quantized_distance(dtype, tolerance, tmp_path):
+    grid = load_sample("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt").to_regulargrid(ppa=30)
+    distance = grid.with_distance()
+    quantized = distance.quantized(dtype)
+    vn.save_npy(tmp_path / "data.npy", quantized)
+    vn.save_metadata(tmp_path / "metadata.txt", quantized.metadata)
+
+    loaded = vn.load(tmp_path / "data.npy", tmp_path / "metadata.txt", mmap=True)
+
+    assert loaded.dtype == np.dtype(dtype)
+    assert loaded.nbytes < distance.nbytes
+    assert loaded.weight_range() == distance.weight_range()
+    assert np.allclose(loaded.weights(), distance.weights(), rtol=0, atol=tolerance)
+
+
+@pytest.mark.parametrize("location", samples)
+def test_load_mmap(location, tmp_path):
+    vino = load_sample(*location)
+    vn.save_npy(tmp_path / "data.npy", vino)
+    vn.save_metadata(tmp_path / "metadata.txt", vino.metadata)
+
+    loaded = vn.load(tmp_path / "data.npy", tmp_path / "metadata.txt", mmap=True)
+
+    assert is_memory_mapped(loaded)
+    assert type(loaded) is type(vino)
+    assert np.array_equal(loaded, vino)
+
+
+def test_guess_format(tmp_path):
+    vino = load_sample("lake", "2D_light.txt", "2D_light_metadata.txt")
+    with open(tmp_path / "data", 'wb') as fp:
+        vn.save_npy(fp, vino)
+    with open(tmp_path / "data.bin", 'wb') as fp:
+        vn.save_npz(fp, vino)
+    text = Path(SAMPLES_PATH) / "lake" / "2D_light.txt"
+
+    assert guess_format(tmp_path / "data") == 'npy'
+    assert guess_format(tmp_path / "data.bin") == 'npz'
+    assert guess_format(text) == 'text'
+
+    with open(tmp_path / "data", 'rb') as fp:
+        fp.read(1)
+        fp.seek(0)
+        assert guess_format(fp) == 'npy'
+        assert fp.tell() == 0
+    with open(text) as fp:
+        assert guess_format(fp) == 'text'
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_save_npz(mmap, tmp_path):
+    bars = load_sample("4d", "4d_cylinder_data.txt", "4d_cylinder_metadata.txt")
+    grid = bars.to_regulargrid()
+    distance = grid.with_distance()
+    vn.save_npz(tmp_path / "grid.npz", grid, bars=bars, distance=distance, bounds=grid.bounds)
+
+    loaded = vn.load(tmp_path / "grid.npz", mmap=mmap)
+    assert type(loaded) is vn.RegularGrid
+    assert is_memory_mapped(loaded) == mmap
+    assert np.array_equal(loaded, grid)
+
+    with vn.open_npz(tmp_path / "grid.npz", mmap=mmap) as npz:
+        assert list(npz) == ['bars', 'distance', 'bounds', 'data']
+        assert npz.version == 1
+        assert npz.metadata('bounds') is None
+        assert np.array_equal(npz['bounds'], grid.bounds)
+        assert np.array_equal(npz['bars'], bars)
+        assert npz['distance'].has_weight()
+        assert np.array_equal(npz['distance'], distance)
+
+
+def test_save_npz_aligned(tmp_path):
+    vino = load_sample("lake", "lake_Isa_R1.dat", "lake_Isa_R1.txt")
+    vn.save_npz(tmp_path / "kdtree.npz", vino, bounds=vino.bounds)
+
+    with vn.open_npz(tmp_path / "kdtree.npz", mmap=True) as npz:
+        for name in npz:
+            array = npz.array(name)
+            assert isinstance(array, np.memmap)
+            assert array.offset % 64 == 0
+
+
+def test_load_npz_legacy(tmp_path):
+    vino = load_sample("lake", "2D_light.txt", "2D_light_metadata.txt")
+    np.savez(tmp_path / "legacy.npz", data=vino, metadata=vino.metadata)
+
+    with pytest.raises(ValueError):
+        vn.load(tmp_path / "legacy.npz")
@@ -10,13 +10,18 @@ from vino.core import (
 from vino.io import (
     load,
     save_csv,
+    save_metadata,
+    load_metadata,
     load_npy,
+    save_npy,
     load_npz,
     save_npz,
+    open_npz,
 )
 
 
 __all__ = [
     'Metadata', 'Numo', 'Vino', 'RegularGrid', 'BarGrid', 'KdTree', 'Polygon',
-    'load', 'save_csv', 'load_npy', 'load_npz', 'save_npz'
+    'load', 'save_csv', 'save_metadata', 'load_metadata', 'load_npy',
+    'save_npy', 'load_npz', 'save_npz', 'open_npz',
 ]
@@ -1,11 +1,11 @@
 from .field import Field
 from .types import (
     TupleField, LiteralField, DateTimeField, BuiltinTypeField, IntegerField,
-    StringField
+    FloatField, StringField
 )
 
 
 __all__ = [
     'Field', 'TupleField', 'LiteralField', 'DateTimeField', 'BuiltinTypeField',
-    'IntegerField', 'StringField',
+    'IntegerField', 'FloatField', 'StringField',
 ]
@@ -70,5 +70,9 @@ class IntegerField(BuiltinTypeField):
     TYPE = int
 
 
+class FloatField(BuiltinTypeField):
+    TYPE = float
+
+
 class StringField(BuiltinTypeField):
     TYPE = str
@@ -3,7 +3,8 @@ from __future__ import annotations
 from typing import Mapping, Any, Iterator, Iterable
 
 from .fields import (
-    Field, TupleField, IntegerField, StringField, DateTimeField, LiteralField
+    Field, TupleField, IntegerField, FloatField, StringField, DateTimeField,
+    LiteralField
 )
 
 
@@ -51,6 +52,8 @@ class Metadata(BaseMetadata):
         'MaximalValues': TupleField(float, sep=' '),
         'PointNumberPerAxis': TupleField(int),
         'PointSize': IntegerField(),
+        'WeightRange': TupleField(float, sep=' '),
+        'WeightScale': FloatField(),
         'ColumnDescription': TupleField(str),
         'dataformat.name': StringField(),
         'dataformat.columns': TupleField(str),
@@ -2,23 +2,101 @@ from __future__ import annotations
 
 import numpy as np
 import numpy.typing as npt
-import numpy.lib.recfunctions as rfn
 
-from typing import cast
+from typing import cast, Sequence
 
 from ..metadata import Metadata
 from ..utils import to_int
 from .regulargrid import RegularGrid, as_ppa_array, grid_positions
-from .typing import NDArrayInt, NDArrayFloat
-from .utils import RectanglesMixin, asrecords
+from .typing import NDArrayInt, NDArrayFloat, NDArrayBool
+from .utils import RectanglesMixin
 
 
-def _bars_merge(bar_a: NDArrayInt, bar_b: NDArrayInt) -> tuple[int, int] | None:
-    a0, a1 = bar_a[-2], bar_a[-1]+1
-    b0, b1 = bar_b[-2], bar_b[-1]+1
-    if a0 <= b0 <= a1 or a0 <= b1 <= a1 or b0 <= a0 <= b0 or b0 <= a1 <= b1:
-        return (min(a0, b0), max(a1, b1)-1)
-    return None
+def merge_bars(
+    groups: NDArrayInt,
+    starts: NDArrayInt,
+    stops: NDArrayInt
+) -> tuple[NDArrayInt, NDArrayInt, NDArrayInt]:
+    """
+    Merge overlapping or contiguous bars sharing the same position.
+
+    Bars must be sorted by position -- given as increasing integer
+    :obj:`groups` -- then by start. Return index of the first bar of each
+    merged bar, with its start and stop.
+    """
+    total = len(groups)
+    groups = groups.astype(np.int64)
+    starts = starts.astype(np.int64)
+    stops = stops.astype(np.int64)
+
+    # Bars of a group are sorted by start, so a bar has to be merged with
+    # the previous ones when it starts at most one cell after the highest
+    # stop of the group so far. To compute it in one pass, shift stops of
+    # each group above those of previous groups.
+    shift = groups * (stops.max(initial=0) + 2)
+    highest = np.maximum.accumulate(stops + shift) - shift
+    first = np.ones(total, dtype=bool)
+    first[1:] = (groups[1:] != groups[:-1]) | (starts[1:] > highest[:-1] + 1)
+
+    merged_first = np.flatnonzero(first)
+    merged_last = np.append(merged_first[1:] - 1, total - 1)[:len(merged_first)]
+
+    return merged_first, starts[merged_first], highest[merged_last]
+
+
+def bars_to_grid(
+    bars: NDArrayInt,
+    indices: Sequence[int],
+    baraxis: int,
+    shape: npt.ArrayLike,
+    dtype: npt.DTypeLike = bool,
+    weights: npt.ArrayLike | None = None
+) -> npt.NDArray:
+    grid_shape = tuple(np.asarray(shape).tolist())
+
+    # Bars are painted in a flat difference array which has one more cell
+    # along bar axis: +1 (or +weight) on the first cell of each bar, and -1
+    # (or -weight) right after its last cell
+    diff_shape = list(grid_shape)
+    diff_shape[baraxis] += 1
+    diff_size = cast(int, np.prod(diff_shape, dtype=int))
+
+    starts = bars[:, indices].astype(np.intp).T
+    stops = starts.copy()
+    stops[baraxis] = bars[:, -1].astype(np.intp) + 1
+
+    starts_index = np.ravel_multi_index(tuple(starts), diff_shape)
+    stops_index = np.ravel_multi_index(tuple(stops), diff_shape)
+
+    crop = tuple(
+        slice(None, -1) if a == baraxis else slice(None)
+        for a in range(len(grid_shape))
+    )
+
+    def accumulate(acc_dtype: npt.DTypeLike, values: npt.ArrayLike) -> npt.NDArray:
+        diff = np.zeros(diff_size, dtype=acc_dtype)
+        np.add.at(diff, starts_index, values)
+        np.subtract.at(diff, stops_index, values)
+        # Accumulating along bar axis gives bars count (or weights sum) per cell
+        grid = diff.reshape(diff_shape)
+        np.cumsum(grid, axis=baraxis, out=grid)
+        return cast(npt.NDArray, grid[crop])
+
+    is_bool = np.issubdtype(dtype, np.bool_)
+
+    if weights is None:
+        # Integer accumulation is exact modulo the integer range, and bars
+        # aren't supposed to overlap, so 8 bits are plenty to find viable cells
+        counts = accumulate(np.uint8 if is_bool else dtype, 1)
+        return counts != 0 if is_bool else np.ascontiguousarray(counts)
+
+    # Floating point sums may leave residues where bars end, so use counts to
+    # make sure that cells outside of bars are exactly zero
+    covered = accumulate(np.uint8, 1) != 0
+    summed = accumulate(np.float64, np.asarray(weights, dtype=np.float64))
+    weighted = np.where(covered, summed, 0)
+
+    return weighted != 0 if is_bool else weighted.astype(dtype, copy=False)
 
 
 class BarGrid(RectanglesMixin, RegularGrid):
@@ -37,6 +115,7 @@ class BarGrid(RectanglesMixin, RegularGrid):
     DTYPE = np.uint32
 
     axes: list[int]
+    _positions_index: dict[tuple[int, ...], tuple[NDArrayInt, NDArrayInt]]
 
     def __init__(self, data: npt.ArrayLike, metadata: Metadata) -> None:
         super().__init__(data, metadata)
@@ -44,6 +123,13 @@ class BarGrid(RectanglesMixin, RegularGrid):
         point_size = self.metadata.get('PointSize', 1)
         if point_size > 1:
             self[:] = self // point_size
+            # Bars are now expressed in points, update metadata accordingly so
+            # that saving then loading them again doesn't divide them twice
+            self.metadata = Metadata(
+                self.metadata,
+                PointSize=1,
+                PointNumberPerAxis=tuple((self.ppa - 1).tolist()),
+            )
 
         # Data array
         columns = [c for c in self.metadata['ColumnDescription'] if c != 'empty']
@@ -59,7 +145,7 @@ class BarGrid(RectanglesMixin, RegularGrid):
     @property
     def dim(self) -> int:
         assert self.size == 0 or len(self.shape) == 2
-        return (cast(int, self.shape[1]) - 1) if self.size > 0 else 0
+        return (cast(int, self.shape[1]) - 1) if self.ndim == 2 else 0
 
     @property
     def baraxis(self) -> int:
@@ -104,6 +190,84 @@ class BarGrid(RectanglesMixin, RegularGrid):
         # [[x0, y0, x1, y1], ...]
         return np.hstack((rectangles_min, rectangles_max))
 
+    def bars_at(self, axes: Sequence[int], positions: npt.ArrayLike) -> tuple[NDArrayInt, NDArrayInt]:
+        """Bars found at each of `positions` along position `axes`, and the
+        index of the position each of them is found at.
+
+        Bars are looked up with a single `searchsorted` in an index of bars
+        sorted by their positions along `axes`, built the first time these
+        axes are used, so that next lookups cost the number of bars found.
+        """
+        bars = np.asarray(self)
+        positions = np.atleast_2d(np.asarray(positions, dtype=np.intp))
+        count = len(positions)
+
+        if not axes:
+            lo, hi = np.zeros(count, dtype=np.intp), np.full(count, len(bars))
+            order = np.arange(len(bars))
+        else:
+            key = tuple(axes)
+            columns = [self.axes.index(a) for a in axes]
+            shape = tuple(self.ppa[list(axes)].tolist())
+
+            if not hasattr(self, '_positions_index'):
+                self._positions_index = {}
+            if key not in self._positions_index:
+                keys = np.ravel_multi_index(tuple(bars[:, columns].astype(np.intp).T), shape)
+                order = np.argsort(keys, kind='stable')
+                self._positions_index[key] = (order, keys[order])
+            order, keys = self._positions_index[key]
+
+            wanted = np.ravel_multi_index(tuple(positions.T), shape)
+            lo, hi = np.searchsorted(keys, wanted, side='left'), np.searchsorted(keys, wanted, side='right')
+
+        # Bars of each position are contiguous in index, from `lo` to `hi`
+        counts = hi - lo
+        index = np.repeat(np.arange(count), counts)
+        found = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - lo, counts)
+
+        return index, bars[order[found]]
+
+    def section(self, plane: Sequence[int], at: Sequence[int]) -> NDArrayBool:
+        """Same as `RegularGrid.section` of :meth:`to_regulargrid`, painting
+        only bars crossing the section, see :meth:`sections`."""
+        assert len(at) == self.dim - 2
+
+        return cast(NDArrayBool, self.sections(plane, [at])[0])
+
+    def sections(self, plane: Sequence[int], positions: npt.ArrayLike) -> NDArrayBool:
+        """Same as `RegularGrid.sections`, painting at once the bars crossing
+        each section, which are looked up together, see :meth:`bars_at`."""
+        assert len(plane) == 2
+
+        positions = np.asarray(positions, dtype=np.intp).reshape(-1, self.dim - 2)
+        fixed = [a for a in range(self.dim) if a not in plane]
+        if np.any(positions < 0) or np.any(positions >= self.ppa[fixed]):
+            raise IndexError("Section positions are out of grid")
+
+        pos_axes = [a for a in fixed if a != self.baraxis]
+        index, bars = self.bars_at(pos_axes, positions[:, [fixed.index(a) for a in pos_axes]])
+        shape = (len(positions),) + tuple(self.ppa[list(plane)].tolist())
+
+        # Bars parallel to sections paint segments of them
+        if self.baraxis in plane:
+            baraxis = list(plane).index(self.baraxis)
+            other = self.axes.index(plane[1 - baraxis])
+            segments = np.column_stack((index, bars[:, other], bars[:, -2], bars[:, -1]))
+            indices = [0] + [2 if a == baraxis else 1 for a in range(2)]
+            return cast(NDArrayBool, bars_to_grid(segments, indices, baraxis + 1, shape))
+
+        # Others cross each of them on a single cell, if any
+        x = positions[index, fixed.index(self.baraxis)]
+        crossing = (bars[:, -2] <= x) & (x <= bars[:, -1])
+        sections = np.zeros(shape, dtype=bool)
+        sections[
+            index[crossing],
+            bars[crossing, self.axes.index(plane[0])],
+            bars[crossing, self.axes.index(plane[1])],
+        ] = True
+        return sections
+
     def permute(self, baraxis: int) -> BarGrid:
         return self.to_regulargrid().to_bargrid(baraxis=baraxis)
 
@@ -125,20 +289,20 @@ class BarGrid(RectanglesMixin, RegularGrid):
             self.metadata
         )
 
-    def to_regulargrid(self, ppa: int | npt.ArrayLike = -1) -> RegularGrid:
+    def to_regulargrid(
+        self,
+        ppa: int | npt.ArrayLike = -1,
+        dtype: npt.DTypeLike = bool,
+        weights: npt.ArrayLike | None = None
+    ) -> RegularGrid:
         if ppa != -1:
+            assert weights is None, "Can't resample weighted bars"
             self = self.to_bargrid(ppa=ppa)
 
-        bar_indices = list(self.indices_min())
-        grid = np.full(self.ppa, False)
-
-        for bar in self:
-            # Build index
-            bar_min, bar_max = bar[-2], bar[-1]+1
-            index = bar[bar_indices].tolist()
-            index[self.baraxis] = slice(bar_min, bar_max)
-            # Fill grid
-            grid[tuple(index)] = True
+        grid = bars_to_grid(
+            np.asarray(self), self.indices_min(), self.baraxis, self.ppa,
+            dtype=dtype, weights=weights,
+        )
 
         new_metadata = Metadata(
             self.metadata,
@@ -215,56 +379,45 @@ class BarGrid(RectanglesMixin, RegularGrid):
         assert np.issubdtype(data.dtype, np.integer)
 
         # Sort all bars in lexical order (first by column 0, then 1, 2, etc.)
-        old_bars_rec = asrecords(data, cols)
-        old_bars_rec.sort()
-        old_bars = rfn.structured_to_unstructured(old_bars_rec, copy=False)
+        # NOTE: lexsort is a lot faster than sorting a structured array view
+        old_bars = np.asarray(data)[np.lexsort(np.asarray(data).T[::-1])]
 
         # Convert all bars from old grid coordinates to new grid coordinates
         new_bars = (
             (old_origin[axes] + old_bars * old_unit[axes] - new_origin[axes]) / new_unit[axes]
         ).round().astype(old_bars.dtype)
 
-        # Build structured array views of old bars and old grid positions
-        # to be able to do a fast search in old bars with `searchsorted` method
-        pos_cols = cols[:-2]
-        pos_axes = range(len(pos_cols))
-        old_bars_positions = asrecords(old_bars[:, pos_axes], pos_cols)
-        old_positions_rec = asrecords(old_positions, pos_cols)
-
-        # New bars list
-        bars = []
-
-        # Iterate over indices of the new grid expressed in old grid coordinates
-        for new_pos, old_pos_rec in zip(new_positions, old_positions_rec):
-            idx = old_bars_positions.searchsorted(old_pos_rec)
-            new_batch: list[NDArrayInt] = []
-
-            # Iterate over bars at current position
-            while idx < len(old_bars) and np.all(old_bars_positions[idx] == old_pos_rec):
-                new_bar = np.concatenate((new_pos, new_bars[idx][-2:]))  # type: ignore
-                idx += 1
-
-                merge = None
-
-                # Already have bars to add at current position?
-                if new_batch:
-                    # Skip duplicates
-                    if np.all(new_bar == new_batch[-1]):
-                        continue
-
-                    # Try to merge the new bar with the last one
-                    merge = _bars_merge(new_batch[-1], new_bar)
-                    if merge is not None:
-                        new_batch[-1][-2:] = merge
-
-                # Otherwise, add the new bar
-                if merge is None:
-                    new_batch.append(new_bar)
-
-            # Finalize by adding current batch to new bars list
-            bars.extend(new_batch)
-
-        if not bars:
-            return np.empty((0, data.shape[1]), dtype=old_bars.dtype)
-
-        return np.array(bars, dtype=old_bars.dtype)
+        # Give a single integer key to each position, in lexical order, so
+        # bars at any position can be looked up with `searchsorted` method
+        pos_count = len(cols) - 2
+        old_bars_positions = old_bars[:, :pos_count].astype(np.int64)
+        pos_shape = old_bars_positions.max(axis=0, initial=0) + 1
+        old_bars_keys = np.ravel_multi_index(tuple(old_bars_positions.T), pos_shape)
+
+        # Positions of the new grid outside of old bars can't match any bar
+        inside = np.all(old_positions < pos_shape, axis=1)
+        inside_keys = np.ravel_multi_index(
+            tuple(old_positions[inside].astype(np.int64).T), pos_shape)
+
+        # Range of old bars found at each position of the new grid
+        lo = np.zeros(len(new_positions), dtype=np.int64)
+        hi = np.zeros(len(new_positions), dtype=np.int64)
+        lo[inside] = np.searchsorted(old_bars_keys, inside_keys, side='left')
+        hi[inside] = np.searchsorted(old_bars_keys, inside_keys, side='right')
+        counts = hi - lo
+
+        # Gather these bars, grouped by new grid position
+        total = counts.sum()
+        groups = np.repeat(np.arange(len(new_positions)), counts)
+        index = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)
+        starts = new_bars[index, -2]
+        stops = new_bars[index, -1]
+
+        merged_first, merged_starts, merged_stops = merge_bars(groups, starts, stops)
+
+        bars = np.empty((len(merged_first), data.shape[1]), dtype=old_bars.dtype)
+        bars[:, :-2] = new_positions[groups[merged_first]]
+        bars[:, -2] = merged_starts
+        bars[:, -1] = merged_stops
+
+        return bars
@@ -3,15 +3,118 @@ from __future__ import annotations
 import numpy as np
 import numpy.typing as npt
 
-from typing import cast
-from itertools import chain
+from typing import cast, Sequence
+from itertools import chain, product
 
 from ..metadata import Metadata
 from .vino import Vino
 from .regulargrid import RegularGrid, as_ppa_array
-from .bargrid import BarGrid
+from .bargrid import BarGrid, merge_bars
 from .utils import RectanglesMixin, asrecords
-from .typing import NDArrayFloat
+from .typing import NDArrayInt, NDArrayFloat, NDArrayBool
+
+
+# Number of bars split from KdTree cells processed at once
+CHUNK_SIZE = 1 << 20
+
+
+def cells_to_grid(cells_min: NDArrayInt, cells_max: NDArrayInt, shape: npt.ArrayLike) -> NDArrayBool:
+    grid_shape = tuple(np.asarray(shape).tolist())
+    dim = len(grid_shape)
+
+    # Paint every cell in a N-dimensional difference array: +1 or -1 on each
+    # corner depending on its parity, so that accumulating along each axis
+    # gives back the number of cells covering each point of the grid.
+    # Rasterized cells only overlap on their borders, so counting modulo 256
+    # is exact enough.
+    diff = np.zeros(tuple(s + 1 for s in grid_shape), dtype=np.uint8)
+    flat = diff.reshape(-1)
+
+    for corner in product((False, True), repeat=dim):
+        points = np.where(corner, cells_max, cells_min)
+        index = np.ravel_multi_index(tuple(points.T), diff.shape)
+        paint = np.subtract if sum(corner) % 2 else np.add
+        paint.at(flat, index, 1)
+
+    for a in range(dim):
+        np.cumsum(diff, axis=a, out=diff)
+
+    return cast(NDArrayBool, diff[tuple(slice(-1) for _ in range(dim))] != 0)
+
+
+def cells_to_bars(
+    cells_min: NDArrayInt,
+    cells_max: NDArrayInt,
+    shape: npt.ArrayLike,
+    baraxis: int,
+    chunk_size: int = CHUNK_SIZE
+) -> NDArrayInt:
+    grid_shape = tuple(np.asarray(shape).tolist())
+    pos_axes = [a for a in range(len(grid_shape)) if a != baraxis]
+    last = pos_axes[-1]
+
+    # Count bars of each slab of the grid along the last position axis -- the
+    # slowest varying one -- before they get merged
+    sections = np.prod(cells_max[:, pos_axes[:-1]] - cells_min[:, pos_axes[:-1]], axis=1)
+    slabs = grid_shape[last]
+    slab_counts = np.cumsum(
+        np.bincount(cells_min[:, last], sections, minlength=slabs+1)
+        - np.bincount(cells_max[:, last], sections, minlength=slabs+1)
+    )[:-1]
+
+    # Group consecutive slabs in chunks of about `chunk_size` bars to bound
+    # memory usage, each chunk giving bars following those of the previous one
+    chunks = (np.cumsum(slab_counts) - slab_counts) // chunk_size
+    limits = [0] + (np.flatnonzero(np.diff(chunks)) + 1).tolist() + [slabs]
+    parts = []
+
+    for start, stop in zip(limits[:-1], limits[1:]):
+        inside = (cells_min[:, last] < stop) & (cells_max[:, last] > start)
+        chunk_min, chunk_max = cells_min[inside], cells_max[inside]
+        chunk_min[:, last] = np.maximum(chunk_min[:, last], start)
+        chunk_max[:, last] = np.minimum(chunk_max[:, last], stop)
+        parts.append(chunk_to_bars(chunk_min, chunk_max, grid_shape, baraxis))
+
+    return np.concatenate(parts)
+
+
+def chunk_to_bars(cells_min: NDArrayInt, cells_max: NDArrayInt, grid_shape: tuple[int, ...], baraxis: int) -> NDArrayInt:
+    dim = len(grid_shape)
+    pos_axes = [a for a in range(dim) if a != baraxis]
+
+    # Split each cell in bars, one for each position it covers
+    extents = cells_max[:, pos_axes] - cells_min[:, pos_axes]
+    counts = np.prod(extents, axis=1)
+    cells = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    positions = []
+    for a, extent in zip(pos_axes, extents.T):
+        extent = extent[cells]
+        positions.append(cells_min[cells, a] + offsets % extent)
+        offsets //= extent
+
+    # Sort bars like RegularGrid.to_bargrid does: by position, first axis
+    # varying fastest, then by start. Sorting one integer key is a lot
+    # faster than a lexical sort.
+    keys_shape = [grid_shape[a] for a in reversed(pos_axes)] + [grid_shape[baraxis]]
+    keys = np.ravel_multi_index(
+        positions[::-1] + [cells_min[cells, baraxis]], keys_shape)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    stops = cells_max[cells[order], baraxis] - 1
+
+    groups, starts = np.divmod(keys, grid_shape[baraxis])
+    merged_first, merged_starts, merged_stops = merge_bars(groups, starts, stops)
+
+    bars = np.empty((len(merged_first), dim + 1), dtype=BarGrid.DTYPE)
+    merged_positions = np.unravel_index(groups[merged_first], keys_shape[:-1])
+    for i, p in enumerate(reversed(merged_positions)):
+        bars[:, i] = p
+    bars[:, -2] = merged_starts
+    bars[:, -1] = merged_stops
+
+    return bars
 
 
 class KdTree(RectanglesMixin, Vino):
@@ -34,7 +137,9 @@ class KdTree(RectanglesMixin, Vino):
         cells_rec = asrecords(self, cols=self.columns)
         cols_min = [self.columns[i] for i in self.indices_min()]
         index = np.argsort(cells_rec, order=cols_min)
-        self[:] = self[index]
+        # Don't write already sorted cells, they may be read-only
+        if np.any(index != np.arange(len(index))):
+            self[:] = self[index]
 
         space_axes = range(self.dim)
         self.axes = list(chain(
@@ -89,9 +194,7 @@ class KdTree(RectanglesMixin, Vino):
             np.max(self.cells_max(), axis=0),  # type: ignore
         )))
 
-    def to_regulargrid(self, ppa: int | npt.ArrayLike) -> RegularGrid:
-        ppa = as_ppa_array(ppa, self.dim)
-
+    def _rasterize(self, ppa: NDArrayInt) -> tuple[Metadata, NDArrayInt, NDArrayInt]:
         bounds = self.bounds
         unit = (bounds[1] - bounds[0]) / ppa
 
@@ -103,10 +206,10 @@ class KdTree(RectanglesMixin, Vino):
 
         assert np.all(cells_min_int <= cells_max_int), "Bogus KdTree rasterization"
 
-        grid = np.full(ppa, False)
-        for cmin, cmax in zip(cells_min_int, cells_max_int):
-            # Fill grid between cmin *included* and cmax *excluded*
-            grid[tuple(slice(cmin[a], cmax[a]) for a in range(self.dim))] = True
+        # Cells are painted between cmin *included* and cmax *excluded*, just
+        # drop those which are empty once cropped to the grid
+        cells_max_int = np.minimum(cells_max_int, ppa)
+        not_empty = np.all(cells_min_int < cells_max_int, axis=1)
 
         metadata = Metadata(
             self.metadata,
@@ -116,7 +219,53 @@ class KdTree(RectanglesMixin, Vino):
             MaximalValues=bounds[1] - unit/2,
         )
 
-        return RegularGrid(grid, metadata)
+        return metadata, cells_min_int[not_empty], cells_max_int[not_empty]
+
+    def section(self, plane: Sequence[int], at: Sequence[int], ppa: int | npt.ArrayLike) -> NDArrayBool:
+        """Same as `RegularGrid.section` of :meth:`to_regulargrid` with
+        `ppa`, painting only cells crossing the section."""
+        assert len(plane) == 2
+        assert len(at) == self.dim - 2
+
+        ppa = as_ppa_array(ppa, self.dim)
+        fixed = [a for a in range(self.dim) if a not in plane]
+        position = np.asarray(at)
+        if np.any(position < 0) or np.any(position >= ppa[fixed]):
+            raise IndexError(f"Section position {tuple(at)} is out of grid")
+
+        _, cells_min, cells_max = self._rasterize(ppa)
+        crossing = np.all(
+            (cells_min[:, fixed] <= position) & (position < cells_max[:, fixed]), axis=1)
+        plane = list(plane)
+
+        return cells_to_grid(cells_min[crossing][:, plane], cells_max[crossing][:, plane], ppa[plane])
+
+    def to_regulargrid(self, ppa: int | npt.ArrayLike) -> RegularGrid:
+        ppa = as_ppa_array(ppa, self.dim)
+        metadata, cells_min, cells_max = self._rasterize(ppa)
+
+        return RegularGrid(cells_to_grid(cells_min, cells_max, ppa), metadata)
+
+    def to_bargrid(self, ppa: int | npt.ArrayLike, sparse: bool = True) -> BarGrid:
+        if not sparse:
+            return self.to_regulargrid(ppa=ppa).to_bargrid()
+
+        ppa = as_ppa_array(ppa, self.dim)
+        metadata, cells_min, cells_max = self._rasterize(ppa)
+
+        # Same bars and columns as RegularGrid.to_bargrid with default baraxis
+        baraxis = 0
+        new_axes = [a for a in range(self.dim) if a != baraxis] + [baraxis, baraxis]
+
+        columns = [f'x{a+1}' for a in new_axes]
+        columns[-2] += 'min'
+        columns[-1] += 'max'
+
+        new_metadata = Metadata(
+            metadata,
+            MinimalValues=np.array(metadata['MinimalValues']),
+            MaximalValues=np.array(metadata['MaximalValues']),
+            ColumnDescription=columns,
+        )
 
-    def to_bargrid(self, ppa: int | npt.ArrayLike) -> BarGrid:
-        return self.to_regulargrid(ppa=ppa).to_bargrid()
+        return BarGrid(cells_to_bars(cells_min, cells_max, ppa, baraxis), new_metadata)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import itertools
+
 import numpy as np
 import numpy.typing as npt
 
-from typing import cast, TYPE_CHECKING, Sequence
+from typing import cast, TYPE_CHECKING, Iterator, Sequence
 from scipy import ndimage  # type: ignore
 
 from ..metadata import Metadata
@@ -14,6 +16,14 @@ if TYPE_CHECKING:
     from .bargrid import BarGrid
 
 
+# Number of grid cells scanned at once when streaming points coordinates
+CHUNK_SIZE = 1 << 22
+
+# Number of cells along each axis of tiles skipped or updated at once by
+# bounded distance transforms, see `distance_blocks`
+DISTANCE_BLOCK_SIZE = 16
+
+
 def grid_positions(axes: npt.ArrayLike) -> NDArrayInt:
     a: NDArrayInt = np.asarray(axes)
     return np.indices(a).T.reshape(-1, len(a)).astype(a.dtype)  # type: ignore
@@ -28,6 +38,135 @@ def as_ppa_array(ppa: int | npt.ArrayLike, dim: int) -> NDArrayInt:
     return ppa_array
 
 
+def rows_to_bars(rows: NDArrayBool, shape: npt.ArrayLike, dtype: npt.DTypeLike) -> NDArrayInt:
+    pos_shape = tuple(np.asarray(shape).tolist())
+    count, length = rows.shape
+
+    assert count == np.prod(pos_shape, dtype=int)
+
+    # Mark every bar boundary: a bar starts where a row switches from False to
+    # True and ends one cell before it switches back, rows borders included
+    edges = np.empty((count, length + 1), dtype=bool)
+    edges[:, 0] = rows[:, 0]
+    edges[:, -1] = rows[:, -1]
+    np.not_equal(rows[:, :-1], rows[:, 1:], out=edges[:, 1:-1])
+
+    # Boundaries are listed row by row, so they come as (start, stop) pairs
+    rows_index, cols_index = np.nonzero(edges)
+    del edges
+
+    bars = np.empty((len(rows_index) // 2, len(pos_shape) + 2), dtype=dtype)
+    # Row indices were flattened with the first axis varying fastest
+    positions = np.unravel_index(rows_index[::2], pos_shape[::-1])
+    for a, pos in enumerate(reversed(positions)):
+        bars[:, a] = pos
+    bars[:, -2] = cols_index[::2]
+    bars[:, -1] = cols_index[1::2] - 1
+
+    return bars
+
+
+def line_distance_transform(grid: NDArrayBool, max_distance: float, dtype: npt.DTypeLike) -> NDArrayFloat:
+    """Squared distance of each cell of `grid` to its closest False cell on
+    the same row along last axis, infinite beyond `max_distance`."""
+    length = grid.shape[-1]
+    index = np.arange(length)
+    # Out of row position farther than any bounded distance
+    far = length + int(max_distance) + 1
+
+    # Closest False cells before and after each cell, scanning rows forward
+    # and backward
+    before = np.where(grid, -far, index)
+    np.maximum.accumulate(before, axis=-1, out=before)
+    after = np.where(grid, length + far, index)[..., ::-1]
+    after = np.minimum.accumulate(after, axis=-1)[..., ::-1]
+
+    distances = np.minimum(index - before, after - index)
+    squared = np.square(distances, dtype=dtype)
+    squared[distances > max_distance] = np.inf
+
+    return cast(NDArrayFloat, squared)
+
+
+def distance_blocks(
+    grid: NDArrayBool,
+    squared: NDArrayFloat,
+    max_distance: float,
+    block_size: int = DISTANCE_BLOCK_SIZE,
+) -> list[tuple[slice, ...]]:
+    """Blocks of `grid` whose distances may still decrease below
+    `max_distance` given `squared` distances along last axis.
+
+    Grid is tiled in cubes of `block_size` cells. A tile is kept if it has
+    True cells and a cell less than `max_distance` away along last axis,
+    either in the tile or within `max_distance` cells of it along the other
+    axes -- other tiles are all False or beyond maximum distance. Kept tiles
+    following each other along last axis are merged in a single block.
+    """
+    reach = int(max_distance)
+    length = grid.shape[-1]
+    blocks = []
+
+    for corner in itertools.product(*(range(0, n, block_size) for n in grid.shape[:-1])):
+        block = tuple(slice(c, min(c + block_size, n)) for c, n in zip(corner, grid.shape))
+        around = tuple(slice(max(b.start - reach, 0), b.stop + reach) for b in block)
+
+        start = None
+        for c in range(0, length + block_size, block_size):
+            tile = slice(c, min(c + block_size, length))
+            kept = (c < length
+                    and grid[block + (tile,)].any()
+                    and squared[around + (tile,)].min() < max_distance ** 2)
+            if kept and start is None:
+                start = c
+            elif not kept and start is not None:
+                blocks.append(block + (slice(start, min(c, length)),))
+                start = None
+
+    return blocks
+
+
+def bounded_distance_transform(
+    grid: NDArrayBool,
+    max_distance: float,
+    dtype: npt.DTypeLike = np.float64,
+    block_size: int = DISTANCE_BLOCK_SIZE,
+) -> NDArrayFloat:
+    """Euclidean distance of each cell of `grid` to its closest False cell,
+    truncated to `max_distance`, stored as floating point `dtype`.
+
+    Squared distances are first computed along last axis, then minimized
+    along each other axis like exact transforms do, but only over cells less
+    than `max_distance` away: that takes ``2 * max_distance`` slice updates
+    per axis, restricted to blocks close to False cells, see
+    `distance_blocks`.
+    """
+    assert max_distance >= 0
+    assert np.issubdtype(dtype, np.floating), "Distances must be floating point"
+
+    reach = int(max_distance)
+    squared = line_distance_transform(grid, max_distance, dtype)
+    blocks = distance_blocks(grid, squared, max_distance, block_size)
+
+    previous = np.empty_like(squared)
+    for axis, length in enumerate(grid.shape[:-1]):
+        previous[...] = squared
+        for block in blocks:
+            for k in range(1, reach + 1):
+                for shift in (k, -k):
+                    start = max(block[axis].start, -shift)
+                    stop = min(block[axis].stop, length - shift)
+                    if start >= stop:
+                        continue
+                    target = block[:axis] + (slice(start, stop),) + block[axis + 1:]
+                    source = block[:axis] + (slice(start + shift, stop + shift),) + block[axis + 1:]
+                    np.minimum(squared[target], previous[source] + k * k, out=squared[target])
+
+    distances = np.sqrt(squared, out=squared)
+
+    return cast(NDArrayFloat, np.minimum(distances, max_distance, out=distances))
+
+
 class RegularGrid(Vino):
     """
     A :attr:`dim`-dimensional array where non-zero elements define the set
@@ -37,6 +176,8 @@ class RegularGrid(Vino):
     euclidean space by congruent rectangular cuboids.
     """
     DATAFORMAT = 'regulargrid'
+    # Distance transforms, see :meth:`with_distance`
+    DISTANCE_METHODS = ('euclidean', 'taxicab', 'chessboard')
 
     ppa: NDArrayInt
     origin: NDArrayFloat
@@ -86,29 +227,61 @@ class RegularGrid(Vino):
     def has_weight(self) -> bool:
         return not np.issubdtype(self.dtype, np.bool_)
 
-    def grid_coordinates(self, axes: Sequence[int] | None = None) -> NDArrayFloat:
+    def grid_coordinates(
+        self,
+        axes: Sequence[int] | None = None,
+        indices: npt.ArrayLike | None = None,
+    ) -> NDArrayFloat:
+        """Coordinates of grid cells restricted to `axes`, in C order, or
+        only those of cells at flat `indices` when given."""
         if axes is None:
-            origin, opposite, ppa = self.origin, self.opposite, self.ppa
+            origin, unit, ppa = self.origin, self.unit, self.ppa
         else:
             axes = list(axes)
-            origin = self.origin[axes]
-            opposite = self.opposite[axes]
-            ppa = self.ppa[axes]
-
-        slices = tuple(
-            slice(start, stop, complex(imag=steps))
-            for start, stop, steps in zip(origin, opposite, ppa)
-        )
-        dim = self.dim if axes is None else len(axes)
-
-        return np.mgrid[slices].reshape(dim, -1).T
+            origin, unit, ppa = self.origin[axes], self.unit[axes], self.ppa[axes]
+
+        if indices is None:
+            indices = np.arange(np.prod(ppa))
+        positions = np.unravel_index(indices, tuple(ppa.tolist()))
+
+        # Same as `np.mgrid` with complex steps, without building the whole
+        # grid of positions
+        coordinates = np.empty((len(positions[0]), len(ppa)))
+        for a, pos in enumerate(positions):
+            np.multiply(pos, unit[a], out=coordinates[:, a])
+            coordinates[:, a] += origin[a]
+
+        return coordinates
+
+    def _flat_mask(self) -> NDArrayBool:
+        flat = np.asarray(self).reshape(-1)
+        return flat > 0 if self.has_weight() else flat
+
+    def iter_points_coordinates(self, chunk_size: int = CHUNK_SIZE) -> Iterator[NDArrayFloat]:
+        """Stream coordinates of viable points, scanning about `chunk_size`
+        grid cells at once, so that memory follows viable points count."""
+        flat = np.asarray(self).reshape(-1)
+        for start in range(0, flat.size, chunk_size):
+            chunk = flat[start:start + chunk_size]
+            if self.has_weight():
+                chunk = chunk > 0
+            indices = np.flatnonzero(chunk)
+            if len(indices):
+                yield self.grid_coordinates(indices=indices + start)
 
     def points_coordinates(self) -> NDArrayFloat:
-        coordinates = self.grid_coordinates()
-        mask = self.ravel() > 0 if self.has_weight() else self.ravel()
-        points = coordinates[mask]
+        points = np.empty((np.count_nonzero(self._flat_mask()), self.dim))
+        count = 0
+        for chunk in self.iter_points_coordinates():
+            points[count:count + len(chunk)] = chunk
+            count += len(chunk)
 
-        return cast(NDArrayFloat, points)
+        return points
+
+    def packed_mask(self) -> npt.NDArray[np.uint8]:
+        """Occupancy of grid cells in C order packed into bits, in little bit
+        order -- see `numpy.packbits`."""
+        return np.packbits(self._flat_mask(), bitorder='little')
 
     def section(self, plane: Sequence[int], at: Sequence[int]) -> NDArrayBool:
         assert len(plane) == 2
@@ -118,38 +291,114 @@ class RegularGrid(Vino):
 
         return cast(NDArrayBool, sections[tuple(at)])
 
+    def sections(self, plane: Sequence[int], positions: npt.ArrayLike) -> NDArrayBool:
+        """Stack of sections along `plane` at each of `positions`, picked in
+        a single pass."""
+        positions = np.asarray(positions, dtype=np.intp).reshape(-1, self.dim - 2)
+        assert len(plane) == 2
+
+        sections = np.moveaxis(np.asarray(self), plane, range(-len(plane), 0))
+
+        return cast(NDArrayBool, sections[tuple(positions.T)])
+
     def section_coordinates(self, plane: Sequence[int], at: Sequence[int]) -> NDArrayFloat:
-        grid_coordinates = self.grid_coordinates(plane)
-        points = grid_coordinates[self.section(plane, at).ravel()]
+        indices = np.flatnonzero(self.section(plane, at))
 
-        return cast(NDArrayFloat, points)
+        return self.grid_coordinates(plane, indices)
 
     def weights(self) -> NDArrayFloat:
         assert self.has_weight()
 
         weights = self.ravel()
 
-        return cast(NDArrayFloat, np.asarray(weights[weights > 0].ravel()))
+        return self.unquantize(weights[weights > 0].ravel())
+
+    def unquantize(self, weights: npt.ArrayLike) -> NDArrayFloat:
+        """Actual values of `weights` taken from this grid, which may be
+        quantized, see :meth:`quantized`."""
+        if 'WeightScale' in self.metadata:
+            return cast(NDArrayFloat, np.asarray(weights) * self.metadata['WeightScale'])
+        return cast(NDArrayFloat, np.asarray(weights))
+
+    def weight_range(self) -> tuple[float, float]:
+        """Smallest and largest weights, as recorded by :meth:`quantized` if
+        available."""
+        assert self.has_weight()
 
-    def with_distance(self, domain: str | None = None) -> RegularGrid:
+        if 'WeightRange' in self.metadata:
+            low, high = self.metadata['WeightRange']
+        else:
+            data = np.asarray(self)
+            low, high = self.unquantize([data.min(), data.max()])
+        return float(low), float(high)
+
+    def quantized(self, dtype: npt.DTypeLike) -> RegularGrid:
+        """Weighted grid with weights stored as `dtype`, their range being
+        recorded as ``WeightRange`` metadatum.
+
+        Non-negative weights may be quantized to unsigned integers, scaled so
+        that the largest weight is the largest integer of `dtype`. The scale
+        is recorded as ``WeightScale`` metadatum, see :meth:`unquantize`.
+        """
+        assert self.has_weight() and 'WeightScale' not in self.metadata
+
+        data = np.asarray(self)
+        low, high = self.weight_range()
+        metadata = Metadata(self.metadata, WeightRange=(low, high))
+
+        dtype = np.dtype(dtype)
+        if np.issubdtype(dtype, np.integer):
+            assert np.issubdtype(dtype, np.unsignedinteger) and low >= 0
+            scale = high / np.iinfo(dtype).max if high > 0 else 1.
+            weights = np.rint(data / scale).astype(dtype)
+            metadata = Metadata(metadata, WeightScale=scale)
+        else:
+            weights = data.astype(dtype, copy=False)
+
+        return RegularGrid(weights, metadata)
+
+    def with_distance(
+        self,
+        domain: str | None = None,
+        method: str = 'euclidean',
+        max_distance: float | None = None,
+        dtype: npt.DTypeLike = np.float64,
+    ) -> RegularGrid:
+        """Grid weighted by the distance of each cell to the closest cell out
+        of the kernel or of the grid, in cells, stored as `dtype`.
+
+        Distances are euclidean, or approximated by a faster chamfer transform
+        with ``taxicab`` or ``chessboard`` `method`. They are truncated to
+        `max_distance` if given, exact euclidean distances being then searched
+        among close cells only, see `bounded_distance_transform`.
+        """
         assert domain is None
         assert not self.has_weight()
+        assert method in self.DISTANCE_METHODS, f"Unknown distance method {method!r}"
 
         # Add border of False around data
         padded = np.pad(self, 1, mode='constant', constant_values=False)  # type: ignore
 
-        # Compute euclidian distance to closest border
-        result = ndimage.distance_transform_edt(padded)
+        # Compute distance to closest border
+        if method != 'euclidean':
+            result = ndimage.distance_transform_cdt(padded, metric=method)
+        elif max_distance is not None:
+            result = bounded_distance_transform(padded, max_distance, dtype)
+        else:
+            result = ndimage.distance_transform_edt(padded)
 
         # Extract distances without 0 border
-        distances = result[tuple(slice(1, -1) for _ in range(result.ndim))]
+        distances = result[tuple(slice(1, -1) for _ in range(result.ndim))].astype(dtype)
+
+        if max_distance is not None:
+            np.minimum(distances, max_distance, out=distances)
 
         return RegularGrid(distances, self.metadata)
 
-    def distances(self, domain: str | None = None) -> NDArrayFloat:
+    def distances(self, domain: str | None = None, **options) -> NDArrayFloat:
         assert not self.has_weight()
 
-        return cast(NDArrayFloat, self.with_distance(domain).weights())
+        return cast(NDArrayFloat, self.with_distance(domain, **options).weights())
 
     def to_bargrid(self, ppa: int | npt.ArrayLike = -1, baraxis: int = -1) -> BarGrid:
         from .bargrid import BarGrid
@@ -162,31 +411,14 @@ class RegularGrid(Vino):
         new_axes = [a for a in range(self.dim) if a != baraxis] + [baraxis, baraxis]
         new_pos_axes = new_axes[:-2]
 
-        # Put bar-axis in last position to facilitate bargrid conversion
-        permuted_grid = np.moveaxis(self, baraxis, self.dim-1) if baraxis != self.dim-1 else self
-
-        bars: list[tuple[int, ...]] = []
-
-        for pos in grid_positions(self.ppa[new_pos_axes]):
-            pos_tuple = tuple(pos)
-            row = permuted_grid[pos_tuple]
-
-            # About 1.5 faster to preallocate bars_loc with np.empty than to
-            # build it with np.concatenate
-            bar_at_end = row[-1]
-            bars_loc_len = len(row) + (1 if bar_at_end else 0)
-            bars_loc = np.empty(bars_loc_len, dtype=bool)
-            bars_loc[0] = row[0]
-            np.not_equal(row[:-1], row[1:], out=bars_loc[1:len(row)])
-            if bar_at_end:
-                bars_loc[-1] = len(row)
+        # Put bar-axis in last position to facilitate bargrid conversion, and
+        # reverse other axes so that rows are enumerated in the same order as
+        # `grid_positions` does (ie. first axis varying fastest)
+        grid = np.asarray(self) if not self.has_weight() else (np.asarray(self) != 0)
+        rows = np.transpose(grid, new_pos_axes[::-1] + [baraxis])
+        rows = rows.reshape(-1, self.ppa[baraxis])
 
-            bars_pos = np.nonzero(bars_loc)[0]
-            bars_len = np.diff(bars_pos.reshape(-1, 2), axis=1).ravel()  # type: ignore
-            bars.extend(
-                (pos_tuple + (b0, b0+bs-1))
-                for b0, bs in zip(bars_pos[::2], bars_len)
-            )
+        bars = rows_to_bars(rows, self.ppa[new_pos_axes], BarGrid.DTYPE)
 
         columns = [f'x{a+1}' for a in new_axes]
         columns[-2] += 'min'
@@ -201,4 +433,4 @@ class RegularGrid(Vino):
             ColumnDescription=columns,
         )
 
-        return BarGrid(np.array(bars, dtype=BarGrid.DTYPE), new_metadata)
+        return BarGrid(bars, new_metadata)
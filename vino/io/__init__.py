@@ -1,7 +1,11 @@
 from .load import load
 from .csv import save_csv
-from .npy import load_npy
-from .npz import load_npz, save_npz
+from .npy import load_npy, save_npy
+from .metadata import save_metadata, load_metadata
+from .npz import load_npz, save_npz, open_npz
 
 
-__all__ = ['load', 'save_csv', 'load_npy', 'load_npz', 'save_npz']
+__all__ = [
+    'load', 'save_csv', 'save_metadata', 'load_metadata', 'load_npy',
+    'save_npy', 'load_npz', 'save_npz', 'open_npz',
+]
@@ -9,6 +9,8 @@ from os import PathLike
 from vino import Vino
 from vino.typing import AnyPath
 
+from .metadata import save_metadata
+
 
 def save_csv(file: TextIO | AnyPath, vino: Vino) -> None:
     """Write Vino in RichCSV file format."""
@@ -21,9 +23,7 @@ def save_csv(file: TextIO | AnyPath, vino: Vino) -> None:
             file = stack.enter_context(open(file, 'w', newline=''))
 
         # Write metadata
-        for field in vino.metadata:
-            value = vino.metadata.get_unparsed(field)
-            file.write(f'#{field}: {value}\n')
+        save_metadata(file, vino.metadata)
 
         # XXX If number of vino data array dimensions is greater than 2,
         #     we have to flatten it to be able to save it in CSV format.
@@ -6,7 +6,8 @@ import numpy as np
 from typing import TextIO, BinaryIO, cast
 from io import RawIOBase, BufferedIOBase, TextIOWrapper
 from numpy.typing import NDArray
-from os import PathLike
+from os import PathLike, fsdecode
+from pathlib import Path
 
 from vino import Metadata, Numo, Vino
 from vino.typing import AnyPath
@@ -18,8 +19,54 @@ from .parsers.helpers import sourcefile_parse
 
 ENCODING = "utf-8"
 
-
-def load(*files: TextIO | BinaryIO | AnyPath) -> Vino:
+# One of 'npz', 'npy' or 'text'
+FileFormat = str
+
+EXTENSIONS: dict[str, FileFormat] = {
+    '.npz': 'npz',
+    '.npy': 'npy',
+}
+
+MAGIC_BYTES: dict[bytes, FileFormat] = {
+    # NPZ files are ZIP archives
+    b'PK\x03\x04': 'npz',
+    b'PK\x05\x06': 'npz',
+    b'\x93NUMPY': 'npy',
+}
+MAGIC_SIZE = max(len(magic) for magic in MAGIC_BYTES)
+
+
+def guess_format(file: TextIO | BinaryIO | AnyPath) -> FileFormat:
+    """Guess format of `file` from its extension or its first bytes, without
+    trying to parse it."""
+    if isinstance(file, (str, bytes, PathLike)):
+        path = Path(fsdecode(file))
+        if path.suffix.lower() in EXTENSIONS:
+            return EXTENSIONS[path.suffix.lower()]
+        with open(path, 'rb') as fp:
+            head = fp.read(MAGIC_SIZE)
+    elif isinstance(file, (RawIOBase, BufferedIOBase)):  # type: ignore
+        stream = cast(BinaryIO, file)
+        position = stream.tell()
+        head = stream.read(MAGIC_SIZE)
+        stream.seek(position)
+    else:
+        return 'text'
+
+    for magic, fmt in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return fmt
+
+    return 'text'
+
+
+def load(*files: TextIO | BinaryIO | AnyPath, mmap: bool = False) -> Vino:
+    """Load a Vino from data and metadata `files`.
+
+    With `mmap`, NPY and NPZ files given by path are memory mapped in
+    copy-on-write mode instead of being read, so that processes loading the same file share
+    its pages until they write to them.
+    """
     # We are going to build a list of metadata chunks and another of data ones
     md_chunks: list[Metadata] = []
     dt_chunks: list[Numo | NDArray] = []
@@ -27,22 +74,16 @@ def load(*files: TextIO | BinaryIO | AnyPath) -> Vino:
     # Parse each file to get a data or metadata chunk
     with contextlib.ExitStack() as stack:
         for file in files:
-            # Try first to open file as NPZ
-            try:
-                vino = load_npz(file)  # type: ignore
+            fmt = guess_format(file)
+
+            if fmt == 'npz':
                 if len(files) > 1:
                     raise ValueError("Please provide only one NPZ file")
-                return vino
-            except ValueError:
-                pass
-
-            # Try to open file as NPY
-            try:
-                # If file is a text stream an exception will be raised
-                dt_chunks.append(load_npy(file))  # type: ignore
+                return load_npz(file, mmap=mmap)  # type: ignore
+
+            if fmt == 'npy':
+                dt_chunks.append(load_npy(file, mmap_mode='c' if mmap else None))  # type: ignore
                 continue
-            except (ValueError, TypeError):
-                pass
 
             # If file is a binary stream try to decode it as text
             if isinstance(file, (RawIOBase, BufferedIOBase)):  # type: ignore
@@ -67,9 +108,10 @@ def load(*files: TextIO | BinaryIO | AnyPath) -> Vino:
             else:
                 dt_chunks.append(r)
 
-    # Merge all numerical data chunks into one numpy array
+    # Merge all numerical data chunks into one numpy array, without copying
+    # it if there is only one
     try:
-        data = np.concatenate(dt_chunks)  # type: ignore
+        data = dt_chunks[0] if len(dt_chunks) == 1 else np.concatenate(dt_chunks)  # type: ignore
     except ValueError as e:
         if not dt_chunks:
             raise ValueError("No data found in input files") from e
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import contextlib
+
+from typing import TextIO
+from os import PathLike
+
+from vino import Metadata
+from vino.typing import AnyPath
+
+from .parsers.metadataparser import MetadataParser
+
+
+def save_metadata(file: TextIO | AnyPath, metadata: Metadata) -> None:
+    """Write metadata in the header format shared by all text file formats."""
+
+    with contextlib.ExitStack() as stack:
+        # Open file if not already done
+        # XXX Keep this isinstance to make static type checker happy
+        if isinstance(file, (str, bytes, PathLike)):
+            file = stack.enter_context(open(file, 'w'))
+
+        for field in metadata:
+            value = metadata.get_unparsed(field)
+            file.write(f'#{field}: {value}\n')
+
+
+def load_metadata(file: TextIO | AnyPath) -> Metadata:
+    """Read metadata written by `save_metadata` function."""
+
+    with contextlib.ExitStack() as stack:
+        # XXX Keep this isinstance to make static type checker happy
+        if isinstance(file, (str, bytes, PathLike)):
+            file = stack.enter_context(open(file))
+
+        return MetadataParser().parse(file)
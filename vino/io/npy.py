@@ -4,14 +4,24 @@ import contextlib
 import numpy as np
 
 from typing import BinaryIO, cast
+from vino import Vino
 from vino.typing import AnyPath
 from numpy.typing import NDArray
 from os import PathLike
 
 
-def load_npy(file: BinaryIO | AnyPath) -> NDArray:
+def load_npy(file: BinaryIO | AnyPath, mmap_mode: str | None = None) -> NDArray:
+    # Memory map file instead of reading it, see `numpy.load`
+    if mmap_mode is not None and isinstance(file, (str, bytes, PathLike)):
+        return cast(NDArray, np.load(file, mmap_mode=mmap_mode, allow_pickle=False))
+
     with contextlib.ExitStack() as stack:
         if isinstance(file, (str, bytes, PathLike)):
             file = stack.enter_context(open(file, 'rb'))
         arr = cast(NDArray, np.lib.format.read_array(file))  # type: ignore
     return arr
+
+
+def save_npy(file: BinaryIO | AnyPath, vino: Vino) -> None:
+    """Write Vino data array in NPY file format, without its metadata."""
+    np.save(file, np.asarray(vino), allow_pickle=False)  # type: ignore
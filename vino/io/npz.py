@@ -1,21 +1,185 @@
 from __future__ import annotations
 
+import io
+import json
+import struct
+import zipfile
+import contextlib
 import numpy as np
 
-from typing import BinaryIO
+from typing import BinaryIO, Iterator, Union, cast
+from numpy.typing import NDArray, ArrayLike
+from os import PathLike, fsdecode
 
-from vino import Vino
+from vino import Metadata, Vino
 from vino.typing import AnyPath
 
+from .metadata import save_metadata, load_metadata
 
-def save_npz(file: BinaryIO | AnyPath, vino: Vino) -> None:
-    np.savez(file, data=vino, metadata=vino.metadata)  # type: ignore
 
+# Version of the NPZ container written by `save_npz`
+VERSION = 1
 
-def load_npz(file: BinaryIO | AnyPath) -> Vino:
-    try:
-        npz = np.lib.npyio.NpzFile(file, allow_pickle=True)  # type: ignore
-    except Exception as e:
-        raise ValueError(f'Failed to load `.npz` file {file!r}') from e
+HEADER = 'header.json'
+DATA = 'data'
+DATA_SUFFIX = '.npy'
+METADATA_SUFFIX = '_metadata.txt'
 
-    return Vino(npz['data'], npz['metadata'].item())
+# Members data are aligned on this boundary in the archive so that they can
+# be memory mapped, same as the NPY format aligns its header
+ALIGNMENT = 64
+# Header ID of the extra field used to pad local file headers, same as the
+# one used by Android zipalign tool
+PADDING_EXTRA_ID = 0xD935
+
+Member = Union[Vino, ArrayLike]
+
+
+def _padding_extra(offset: int, name: str, zip64: bool) -> bytes:
+    """Extra field padding local file header of member `name` written at
+    `offset` so that its data starts on an `ALIGNMENT` boundary."""
+    header_size = zipfile.sizeFileHeader + len(name.encode()) + 4
+    # zipfile appends a 20 bytes zip64 extra field to local file header
+    if zip64:
+        header_size += 20
+    padding = -(offset + header_size) % ALIGNMENT
+    return struct.pack('<HH', PADDING_EXTRA_ID, padding) + bytes(padding)
+
+
+def _write_array(archive: zipfile.ZipFile, name: str, array: NDArray) -> None:
+    info = zipfile.ZipInfo(name + DATA_SUFFIX, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+
+    # Don't let zipfile guess zip64 from file size, we need to know it to
+    # compute padding
+    zip64 = array.nbytes + ALIGNMENT * 2 > zipfile.ZIP64_LIMIT
+    info.extra = _padding_extra(archive.fp.tell(), info.filename, zip64)  # type: ignore
+
+    with archive.open(info, 'w', force_zip64=zip64) as fp:
+        np.lib.format.write_array(fp, array, allow_pickle=False)
+
+
+def _write_metadata(archive: zipfile.ZipFile, name: str, metadata: Metadata) -> None:
+    text = io.StringIO()
+    save_metadata(text, metadata)
+    archive.writestr(name + METADATA_SUFFIX, text.getvalue().encode())
+
+
+def save_npz(file: BinaryIO | AnyPath, vino: Vino, **members: Member) -> None:
+    """Write Vino in a versioned NPZ container, along with optional named
+    `members` such as precomputed bars, distance grid or bounds.
+
+    Arrays are stored uncompressed and aligned so that they can be memory
+    mapped, metadata are stored in their text format, nothing is pickled.
+    """
+    items = dict(members, **{DATA: vino})
+    header = dict(version=VERSION, members=list(items))
+
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        archive.writestr(HEADER, json.dumps(header))
+        for name, member in items.items():
+            if isinstance(member, Vino):
+                _write_metadata(archive, name, member.metadata)
+            _write_array(archive, name, np.asarray(member))
+
+
+class NpzContainer:
+    """
+    Read access to a NPZ container written by `save_npz`.
+
+    Members are only read when asked for, and memory mapped in copy-on-write
+    mode when `mmap` is true and the container is given by its path.
+    """
+    def __init__(self, file: BinaryIO | AnyPath, mmap: bool = False) -> None:
+        self.path = fsdecode(file) if isinstance(file, (str, bytes, PathLike)) else None
+        self.mmap = mmap and self.path is not None
+        try:
+            self.archive = zipfile.ZipFile(file)
+            header = json.loads(self.archive.read(HEADER))
+            self.version = int(header['version'])
+            self.members: list[str] = list(header['members'])
+        except KeyError as e:
+            raise ValueError(f'Missing {e} in `.npz` file {file!r}, is it a legacy one?') from e
+        except Exception as e:
+            raise ValueError(f'Failed to load `.npz` file {file!r}') from e
+
+        if self.version > VERSION:
+            raise ValueError(
+                f'Unsupported `.npz` file version {self.version} (max {VERSION})')
+
+    def __enter__(self) -> NpzContainer:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.members)
+
+    def _data_offset(self, info: zipfile.ZipInfo) -> int:
+        # Local file header may differ from central directory one, read it
+        self.archive.fp.seek(info.header_offset)  # type: ignore
+        header = struct.unpack(
+            zipfile.structFileHeader,
+            self.archive.fp.read(zipfile.sizeFileHeader))  # type: ignore
+        return (
+            info.header_offset + zipfile.sizeFileHeader
+            + header[zipfile._FH_FILENAME_LENGTH]  # type: ignore
+            + header[zipfile._FH_EXTRA_FIELD_LENGTH]  # type: ignore
+        )
+
+    def _memmap(self, info: zipfile.ZipInfo) -> NDArray:
+        offset = self._data_offset(info)
+        with open(cast(str, self.path), 'rb') as fp:
+            fp.seek(offset)
+            version = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(fp)
+            offset = fp.tell()
+        return np.memmap(
+            self.path, dtype=dtype, mode='c', offset=offset, shape=shape,
+            order='F' if fortran else 'C')
+
+    def array(self, name: str) -> NDArray:
+        """Data array of member `name`."""
+        if name not in self.members:
+            raise KeyError(name)
+        info = self.archive.getinfo(name + DATA_SUFFIX)
+        if self.mmap and info.compress_type == zipfile.ZIP_STORED:
+            return self._memmap(info)
+        with self.archive.open(info) as fp:
+            return cast(NDArray, np.lib.format.read_array(fp, allow_pickle=False))
+
+    def metadata(self, name: str = DATA) -> Metadata | None:
+        """Metadata of member `name`, None if it is a bare array."""
+        try:
+            text = self.archive.read(name + METADATA_SUFFIX).decode()
+        except KeyError:
+            return None
+        return load_metadata(io.StringIO(text))
+
+    def __getitem__(self, name: str) -> Member:
+        array = self.array(name)
+        metadata = self.metadata(name)
+        return array if metadata is None else Vino(array, metadata)
+
+    def vino(self) -> Vino:
+        return cast(Vino, self[DATA])
+
+
+def open_npz(file: BinaryIO | AnyPath, mmap: bool = False) -> NpzContainer:
+    return NpzContainer(file, mmap=mmap)
+
+
+def load_npz(file: BinaryIO | AnyPath, mmap: bool = False) -> Vino:
+    with contextlib.closing(open_npz(file, mmap=mmap)) as npz:
+        return npz.vino()
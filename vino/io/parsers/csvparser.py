@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import io
 import re
+import numpy as np
 import pandas as pd
 import numpy.typing as npt
 
 from pandas.core.arrays import ExtensionArray
 from pandas.errors import ParserError as PandasParseError
-from typing import TextIO, Sequence, cast
+from typing import Iterator, TextIO, Sequence, cast
 
 from ...core.utils import to_int
 
@@ -18,23 +20,93 @@ from .exceptions import ParseError
 C_ERROR_PATTERN = re.compile('C error: (.*)')
 C_ERROR_LINENO_PATTERN = re.compile(r' (?:in line|at row) (\d+)')
 
+# Number of rows parsed at once
+BLOCK_SIZE = 1 << 17
+
+
+def estimate_rows(stream: TextIO, sample: int = 64) -> int | None:
+    """Estimate number of lines remaining in `stream` from the length of its
+    next `sample` lines, None if `stream` size can't be known."""
+    try:
+        start = stream.tell()
+        lines = [stream.readline() for _ in range(sample)]
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(start)
+    except (OSError, ValueError):
+        return None
+
+    # Text streams positions are opaque numbers, only trust them if they
+    # look like offsets
+    size = sum(len(line) for line in lines)
+    if not 0 <= start <= end or size == 0:
+        return None
+
+    return (end - start) * sum(1 for line in lines if line) // size
+
+
+class RowBuffer:
+    """
+    Growable array of rows, blocks of rows are appended to it and copied in
+    place until its capacity is reached. Use :meth:`to_numpy` to get filled
+    rows once done.
+    """
+    GROWTH = 1.5
+
+    def __init__(self, capacity: int = 0, dtype: npt.DTypeLike | None = None) -> None:
+        self.capacity = capacity
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.array: npt.NDArray | None = None
+        self.size = 0
+
+    def reserve(self, capacity: int, dtype: np.dtype, columns: int) -> None:
+        array = np.empty((capacity, columns), dtype=dtype)
+        if self.array is not None:
+            array[:self.size] = self.array[:self.size]
+        self.array = array
+        self.capacity = capacity
+        self.dtype = dtype
+
+    def append(self, block: npt.NDArray) -> None:
+        count, columns = block.shape
+        dtype = block.dtype if self.dtype is None else np.result_type(self.dtype, block.dtype)
+
+        if self.array is None or dtype != self.dtype or self.size + count > self.capacity:
+            capacity = max(self.capacity, self.size + count)
+            if self.array is not None and self.size + count > self.capacity:
+                capacity = max(capacity, int(self.capacity * self.GROWTH))
+            self.reserve(capacity, dtype, columns)
+
+        assert self.array is not None
+        self.array[self.size:self.size+count] = block
+        self.size += count
+
+    def to_numpy(self) -> npt.NDArray:
+        assert self.array is not None
+        # Shrink array in place, nobody else has a reference to it
+        self.array.resize((self.size, self.array.shape[1]), refcheck=False)
+        array, self.array = self.array, None
+        return array
+
 
 class CSVParserMixin(TextParserMixin):
     @classmethod
-    def parse_csv_to_numpy(
+    def iter_csv_to_numpy(
             cls,
             stream: TextIO,
             skiprows: int = 0,
             usecols: list[int] | None = None,
             header: bool = True,
-            dtype: str | type | None = None) -> npt.NDArray:
+            dtype: str | type | None = None,
+            block_size: int = BLOCK_SIZE) -> Iterator[npt.NDArray]:
+        """Parse CSV data from `stream`, yielding blocks of at most
+        `block_size` rows."""
 
         try:
             # XXX usecols is NOT an ExtensionArray but pandas-stubs does not
             #     correctly declare usecols parameter type, so hack it!
             # XXX float_precision='round_trip' should resolve accuracy issues,
             #     see https://stackoverflow.com/a/36909497
-            df = pd.read_csv(
+            reader = pd.read_csv(
                 stream,
                 skiprows=skiprows,
                 usecols=cast(ExtensionArray, usecols),
@@ -44,10 +116,13 @@ class CSVParserMixin(TextParserMixin):
                 low_memory=True,
                 header=0 if header else None,
                 float_precision='round_trip',
+                chunksize=block_size,
             )
-            # XXX pandas-stubs does not correctly declare return type for
-            #     to_numpy method
-            return cast(npt.NDArray, df.to_numpy())
+            with reader:
+                for df in reader:
+                    # XXX pandas-stubs does not correctly declare return type
+                    #     for to_numpy method
+                    yield cast(npt.NDArray, df.to_numpy())
 
         except PandasParseError as e:
             # Try to extract error message from pandas exception
@@ -71,6 +146,26 @@ class CSVParserMixin(TextParserMixin):
         except ValueError as e:
             raise ParseError(f"CSV parse error: {e.args[0]}") from e
 
+    @classmethod
+    def parse_csv_to_numpy(
+            cls,
+            stream: TextIO,
+            skiprows: int = 0,
+            usecols: list[int] | None = None,
+            header: bool = True,
+            dtype: str | type | None = None,
+            block_size: int = BLOCK_SIZE) -> npt.NDArray:
+        """Parse CSV data from `stream` block by block into a buffer
+        preallocated from an estimate of the number of rows, so that peak
+        memory stays close to the size of the resulting array."""
+
+        capacity = estimate_rows(stream) or 0
+        # Leave some room for estimation errors to avoid a late reallocation
+        buffer = RowBuffer(capacity + capacity // 20, dtype)
+        for block in cls.iter_csv_to_numpy(stream, skiprows, usecols, header, dtype, block_size):
+            buffer.append(block)
+        return buffer.to_numpy()
+
 
 class CSVParser(CSVParserMixin, Parser[npt.NDArray]):
     def parse(self, stream: TextIO) -> npt.NDArray:
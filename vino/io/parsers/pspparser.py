@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import numpy as np
 
-from typing import TextIO
+from typing import Iterator, TextIO
 
 from ...core.numo import Numo
+from ...core.metadata import Metadata
 
 from .exceptions import WrongFormatError
+from .csvparser import BLOCK_SIZE
 from .richcsvparser import RichCSVParser
 
 
@@ -18,36 +20,66 @@ class PSPParser(RichCSVParser):
     def is_pspheader(cls, line: str) -> bool:
         return line.strip() == cls.PSP_HEADER
 
+    @classmethod
+    def parse_pspheader(cls, stream: TextIO) -> None:
+        # XXX Use readline instead of next to keep stream position available
+        if not cls.is_pspheader(stream.readline()):
+            raise WrongFormatError("Couldn't find PSP header")
+
+    @staticmethod
+    def parse_columns(metadata: Metadata) -> list[int]:
+        # Read ColumnDescription metadatum
+        coldesc = metadata.get('ColumnDescription')
+        if not coldesc:
+            raise WrongFormatError("ColumnDescription metadata not found")
+
+        # Generate integer indices list of columns to be kept
+        return [i for i, c in enumerate(coldesc) if c != 'empty']
+
     @classmethod
     def parse_data(
             cls,
             stream: TextIO,
             columns: list[int] | None = None) -> np.ndarray:
 
-        next_line = next(stream, '')
-        if cls.is_pspheader(next_line):
-            return cls.parse_csv_to_numpy(
-                stream,
-                dtype=cls.DTYPE,
-                usecols=columns,
-                header=False,
-            )
+        cls.parse_pspheader(stream)
+
+        return cls.parse_csv_to_numpy(
+            stream,
+            dtype=cls.DTYPE,
+            usecols=columns,
+            header=False,
+        )
 
-        raise WrongFormatError("Couldn't find PSP header")
+    @classmethod
+    def iter_data(
+            cls,
+            stream: TextIO,
+            columns: list[int] | None = None,
+            block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+
+        cls.parse_pspheader(stream)
+
+        return cls.iter_csv_to_numpy(
+            stream,
+            dtype=cls.DTYPE,
+            usecols=columns,
+            header=False,
+            block_size=block_size,
+        )
 
     def parse(self, stream: TextIO) -> Numo:
         # Parse metadata
         metadata = self.parse_metadata(stream)
 
-        # Read ColumnDescription metadatum
-        coldesc = metadata.get('ColumnDescription')
-        if not coldesc:
-            raise WrongFormatError("ColumnDescription metadata not found")
-
-        # Generate integer indices list of columns to be kept
-        columns = [i for i, c in enumerate(coldesc) if c != 'empty']
-
         # Parse PSP data keeping only specified columns
-        data = self.parse_data(stream, columns=columns)
+        data = self.parse_data(stream, columns=self.parse_columns(metadata))
 
         return Numo(data, metadata)
+
+    def iterparse(self, stream: TextIO, block_size: int = BLOCK_SIZE) -> Iterator[Numo]:
+        metadata = self.parse_metadata(stream)
+        columns = self.parse_columns(metadata)
+
+        for block in self.iter_data(stream, columns=columns, block_size=block_size):
+            yield Numo(block, metadata)
@@ -1,11 +1,11 @@
 import numpy as np
 
-from typing import TextIO
+from typing import Iterator, TextIO
 
 from ...core.numo import Numo
 
 from .parser import Parser
-from .csvparser import CSVParserMixin
+from .csvparser import CSVParserMixin, BLOCK_SIZE
 from .metadataparser import MetadataParserMixin
 
 
@@ -14,6 +14,10 @@ class RichCSVParser(MetadataParserMixin, CSVParserMixin, Parser[Numo]):
     def parse_data(cls, stream: TextIO) -> np.ndarray:
         return cls.parse_csv_to_numpy(stream)
 
+    @classmethod
+    def iter_data(cls, stream: TextIO, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+        return cls.iter_csv_to_numpy(stream, block_size=block_size)
+
     def parse(self, stream: TextIO) -> Numo:
         # Parse optional metadata header
         metadata = self.parse_metadata(stream)
@@ -22,3 +26,11 @@ class RichCSVParser(MetadataParserMixin, CSVParserMixin, Parser[Numo]):
         data = self.parse_data(stream)
 
         return Numo(data, metadata)
+
+    def iterparse(self, stream: TextIO, block_size: int = BLOCK_SIZE) -> Iterator[Numo]:
+        """Parse metadata then yield data by blocks of at most `block_size`
+        rows, each block sharing the same metadata."""
+        metadata = self.parse_metadata(stream)
+
+        for block in self.iter_data(stream, block_size=block_size):
+            yield Numo(block, metadata)
@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.utils.html import escape
+from django.utils.html import escape, format_html
 
 from .importable import ImportableMixin
 from .models import (Symbol, ViabilityProblem, ParameterSet, Software, Kernel,
-                     DataFormat)
+                     DataFormat, ImportJob)
 
 
 admin.site.index_template = 'admin/sharekernel_index.html'
@@ -105,3 +105,38 @@ class KernelAdmin(ImportableMixin, admin.ModelAdmin):
         return mark_safe(f'<a href="{escape(url)}">{escape(title)}</a>')
     vp.short_description = 'Viability problem'  # type: ignore
     vp.admin_order_field = 'params__vp__title'  # type: ignore
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        '__str__', 'status', 'progress_bar', 'step', 'kernel_link', 'owner',
+        'date_created', 'date_started', 'date_finished')
+    list_filter = ('status',)
+    readonly_fields = (
+        'owner', 'status', 'progress_bar', 'step', 'kernel_link', 'sourcefiles',
+        'worker', 'error', 'date_created', 'date_started', 'date_finished')
+    fields = readonly_fields
+    actions = ('retry',)
+
+    def has_add_permission(self, request):
+        # Jobs are created by the kernel import form
+        return False
+
+    def progress_bar(self, obj):
+        return format_html(
+            '<progress max="100" value="{0}">{0}%</progress> {0}%', obj.progress)
+    progress_bar.short_description = 'Progress'  # type: ignore
+    progress_bar.admin_order_field = 'progress'  # type: ignore
+
+    def kernel_link(self, obj):
+        if obj.kernel is None:
+            return '-'
+        url = reverse("admin:sharekernel_kernel_change", args=(obj.kernel.pk,))
+        return format_html('<a href="{}">{}</a>', url, obj.kernel.title)
+    kernel_link.short_description = 'Kernel'  # type: ignore
+
+    def retry(self, request, queryset):
+        retried = sum(job.retry() for job in queryset.retryable())
+        self.message_user(request, f"{retried} job(s) queued again.")
+    retry.short_description = 'Queue selected failed or stalled jobs again'  # type: ignore
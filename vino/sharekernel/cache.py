@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+import shutil
+import logging
+import threading
+import contextlib
+
+from collections import OrderedDict
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Callable, Optional, Sequence, Union, TYPE_CHECKING
+
+import numpy as np
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+import vino as vn
+
+if TYPE_CHECKING:
+    from .models import Kernel
+
+
+logger = logging.getLogger(__name__)
+
+PPA = Union[None, int, Sequence[int]]
+StrPath = Union[str, Path]
+
+# Distance weights, such as ``distance``, ``distance-taxicab`` or
+# ``distance-euclidean-max8``, see `distance_options`
+DISTANCE_WEIGHT = 'distance(?:-(?:{}))?(?:-max[1-9][0-9]*)?'.format('|'.join(vn.RegularGrid.DISTANCE_METHODS))
+
+
+def distance_options(weight: Optional[str]) -> Optional[dict]:
+    """Options of `RegularGrid.with_distance` selected by a distance
+    `weight`, optionally naming a method and a maximum distance, or None if
+    `weight` isn't a distance."""
+    if weight is None or not re.fullmatch(DISTANCE_WEIGHT, weight):
+        return None
+    options: dict = {}
+    for option in weight.split('-')[1:]:
+        if option.startswith('max'):
+            options['max_distance'] = int(option[3:])
+        else:
+            options['method'] = option
+    return options
+
+
+def derive(vno: vn.Vino, target: str, ppa: PPA) -> vn.Vino:
+    """Build `target` representation of `vno` -- without any weight. Grids
+    are converted without resampling if `ppa` is -1."""
+    unresampled = ppa is None or bool(np.all(np.asarray(ppa) == -1))
+    if unresampled and not isinstance(vno, (vn.RegularGrid, vn.BarGrid)):
+        raise ValueError(f"Can't convert {vno.DATAFORMAT} vino without resampling")
+
+    if target == 'regulargrid':
+        if type(vno) is vn.RegularGrid:
+            if unresampled or np.all(np.asarray(ppa) == vno.ppa):
+                return vno
+            # Regular grids can only be resampled through bars
+            vno = vno.to_bargrid()
+        return vno.to_regulargrid(ppa=ppa)  # type: ignore
+
+    if target == 'bargrid':
+        if type(vno) is vn.RegularGrid:
+            vno = vno.to_bargrid()
+        if isinstance(vno, vn.BarGrid):
+            if unresampled or np.all(np.asarray(ppa) == vno.ppa):
+                return vno
+        return vno.to_bargrid(ppa=ppa)  # type: ignore
+
+    raise ValueError(f"Unknown target representation {target!r}")
+
+
+class DataCache:
+    """
+    Process-wide memory bounded cache of loaded vinos, shared between
+    requests so that a datafile is not parsed again each time a kernel is
+    fetched from database.
+
+    Entries are keyed by path and remember the inode, size and modification
+    time of their file, so that a replaced file is loaded again. Cached vinos
+    are read-only since they are shared. Least recently used entries are
+    evicted when the total size of arrays grows over the maximum size.
+    """
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[tuple[int, int, int], vn.Vino]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        return int(settings.DATA_CACHE_MAX_SIZE)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(
+                entries=len(self._entries),
+                size=self.size,
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+    def _pop(self, key: str) -> None:
+        _, vno = self._entries.pop(key)
+        self.size -= vno.nbytes
+
+    def get(self, path: StrPath, load: Callable[[Path], vn.Vino], key: Optional[str] = None) -> vn.Vino:
+        """Load vino from `path` with `load` function, or get it from cache
+        if `path` didn't change since it was loaded. Use `key` to cache
+        several vinos loaded from a same file."""
+        key = str(path) if key is None else key
+        stat = os.stat(path)
+        version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Don't hold the lock while parsing, concurrent loads of the same
+        # file are harmless and the last one wins
+        vno = load(Path(path))
+        vno.flags.writeable = False
+
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            if vno.nbytes <= self.max_size:
+                self._entries[key] = (version, vno)
+                self.size += vno.nbytes
+                while self.size > self.max_size:
+                    self._pop(next(iter(self._entries)))
+                    self.evictions += 1
+
+        return vno
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DerivedCache:
+    """
+    On-disk cache of representations derived from kernels data, such as
+    resampled bar grids, rasterized regular grids or distance grids, which
+    are stored with ``DISTANCE_DTYPE`` type -- one for each distance method
+    and maximum distance, see `distance_options`.
+
+    Each entry is stored as a NPY data file with its metadata sidecar, in a
+    directory named after the kernel datafile -- which embeds its sha256
+    hash, see `make_datafile` -- so that entries can't outlive the data they
+    were derived from. Least recently used entries are evicted when the cache
+    grows over its maximum size, last use is tracked with access time.
+    Loaded entries are shared in memory through `data_cache`.
+    """
+    DATA_SUFFIX = '.npy'
+    METADATA_SUFFIX = '.txt'
+
+    @property
+    def root(self) -> Path:
+        return Path(default_storage.location) / settings.DERIVED_CACHE_DIR
+
+    @property
+    def max_size(self) -> int:
+        return int(settings.DERIVED_CACHE_MAX_SIZE)
+
+    @staticmethod
+    def key(target: str, ppa: PPA, weight: Optional[str]) -> str:
+        ppa_key = 'none' if ppa is None else '-'.join(str(x) for x in np.ravel(ppa))
+        weight_key = f"{weight}-{settings.DISTANCE_DTYPE}" if distance_options(weight) is not None else weight
+        return f"{target}_{ppa_key}_{weight_key or 'none'}"
+
+    def directory(self, datafile: str) -> Path:
+        return self.root / Path(datafile).stem
+
+    def path(self, kernel: Kernel, target: str, ppa: PPA, weight: Optional[str]) -> Path:
+        name = self.key(target, ppa, weight) + self.DATA_SUFFIX
+        return self.directory(kernel.datafile.name) / name
+
+    def load(self, path: Path) -> Optional[vn.Vino]:
+        try:
+            # Mark entry as recently used, keeping modification time as is
+            # since it identifies file version in `data_cache`
+            os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        try:
+            return data_cache.get(path, self.load_entry)
+        except (OSError, ValueError) as e:
+            # Entry may have been evicted by another worker in the meantime
+            logger.warning("Can't load derived cache entry %s: %s", path, e)
+            return None
+
+    @classmethod
+    def load_entry(cls, path: Path) -> vn.Vino:
+        return vn.load(path, path.with_suffix(cls.METADATA_SUFFIX), mmap=True)
+
+    def store(self, path: Path, vno: vn.Vino) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to temporary files first then move them, so concurrent
+        # workers never read a partially written entry
+        with NamedTemporaryFile('w', dir=path.parent, delete=False) as md:
+            vn.save_metadata(md, vno.metadata)
+        with NamedTemporaryFile('wb', dir=path.parent, delete=False) as dt:
+            vn.save_npy(dt, vno)
+
+        # Python temporary files doesn't take umask into account, chmod them
+        for temp in (md.name, dt.name):
+            os.chmod(temp, 0o0644)
+
+        os.replace(md.name, path.with_suffix(self.METADATA_SUFFIX))
+        os.replace(dt.name, path)
+
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """List (last use time, size, path) of every cache entry."""
+        entries = []
+        for path in self.root.glob(f'*/*{self.DATA_SUFFIX}'):
+            try:
+                metadata = path.with_suffix(self.METADATA_SUFFIX)
+                stat = path.stat()
+                size = stat.st_size + metadata.stat().st_size
+                entries.append((stat.st_atime, size, path))
+            except OSError:
+                pass
+        return entries
+
+    def remove(self, path: Path) -> None:
+        for p in (path, path.with_suffix(self.METADATA_SUFFIX)):
+            with contextlib.suppress(OSError):
+                p.unlink()
+        with contextlib.suppress(OSError):
+            path.parent.rmdir()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until cache fits its size."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self.remove(path)
+            total -= size
+
+    def invalidate(self, datafile: str) -> None:
+        """Remove every entry derived from `datafile`."""
+        if datafile:
+            shutil.rmtree(self.directory(datafile), ignore_errors=True)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def get(self, kernel: Kernel, target: str, ppa: PPA = None, weight: Optional[str] = None) -> vn.Vino:
+        """Get `target` representation of `kernel` data, resampled with `ppa`
+        and weighted by `weight`, computing and storing it if needed."""
+        path = self.path(kernel, target, ppa, weight)
+
+        vno = self.load(path)
+        if vno is not None:
+            return vno
+
+        # Build derived representation, from other cached ones when possible
+        options = distance_options(weight)
+        if options is not None:
+            # Compute distances in single precision unless they are stored
+            # in double precision
+            dtype = np.result_type(settings.DISTANCE_DTYPE, np.float32)
+            grid = self.get(kernel, 'regulargrid', ppa)
+            distances = grid.with_distance(dtype=dtype, **options)  # type: ignore
+            vno = distances.quantized(settings.DISTANCE_DTYPE)
+        elif weight is not None:
+            raise ValueError(f"Unknown weight {weight!r}")
+        elif target == 'hull':
+            vno = self.get(kernel, 'bargrid', ppa).hull()  # type: ignore
+        else:
+            source = kernel.lod(ppa)
+            vno = derive(source, target, ppa)
+            # Don't duplicate kernel data nor its levels of detail
+            if vno is source:
+                return vno
+
+        self.store(path, vno)
+
+        return vno
+
+
+data_cache = DataCache()
+derived_cache = DerivedCache()
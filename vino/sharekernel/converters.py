@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import Sequence
 
+from .cache import DISTANCE_WEIGHT
+
 
 class PositiveIntTupleConverter:
     LIMIT = 100
@@ -12,3 +14,44 @@ class PositiveIntTupleConverter:
 
     def to_url(self, value: Sequence[int]) -> str:
         return ','.join(value)
+
+
+class PositiveIntRangeTupleConverter(PositiveIntTupleConverter):
+    """Tuple of integer lists, each item being an integer, an inclusive range
+    such as ``0-9``, or several of them joined by ``+``, for example
+    ``0-9+20,4`` is ``((0, 1, ..., 9, 20), (4,))``.
+
+    Lists can't hold more than `MAX_COUNT` integers, longer ones don't match
+    so that huge ranges are never expanded."""
+    MAX_COUNT = 4096
+
+    regex = '[0-9][-+,0-9]*'
+
+    @classmethod
+    def parse(cls, item: str) -> tuple[int, ...]:
+        values: list[int] = []
+        for part in item.split('+'):
+            start, _, stop = part.partition('-')
+            positions = range(int(start), int(stop or start) + 1)
+            if len(values) + len(positions) > cls.MAX_COUNT:
+                raise ValueError(f"More than {cls.MAX_COUNT} integers in {item!r}")
+            values.extend(positions)
+        return tuple(values)
+
+    def to_python(self, value: str) -> tuple[tuple[int, ...]]:  # type: ignore
+        return tuple(self.parse(x) for x in value.split(',', self.LIMIT))
+
+    def to_url(self, value: Sequence[Sequence[int]]) -> str:  # type: ignore
+        return ','.join('+'.join(str(x) for x in item) for item in value)
+
+
+class DistanceWeightConverter:
+    """Distance weight, such as ``distance-taxicab-max8``, see
+    `distance_options`."""
+    regex = DISTANCE_WEIGHT
+
+    def to_python(self, value: str) -> str:
+        return value
+
+    def to_url(self, value: str) -> str:
+        return value
@@ -1,8 +1,11 @@
 from django import forms
-from django.contrib import admin
-from django.urls import path
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.urls import path, reverse
 from django.utils.translation import gettext_lazy as _
 
+from .models import ImportJob
+
 
 class ImportForm(forms.Form):
     import_files = forms.FileField(
@@ -40,8 +43,9 @@ class ImportAdmin(admin.ModelAdmin):
         return super().render_change_form(request, context, *args, **kwargs)
 
     def save_form(self, request, form, change):
+        # Files are parsed by background workers, see `runjobs` command
         files = request.FILES.getlist('import_files')
-        return self.model.from_files(*files)
+        return ImportJob.submit(*files, owner=request.user)
 
     def save_related(self, request, form, formsets, change):
         # Override this method to avoid errors
@@ -51,6 +55,17 @@ class ImportAdmin(admin.ModelAdmin):
         # Imported model is already saved at this point, don't do anything
         pass
 
+    def log_addition(self, request, object, message):
+        # Imported model doesn't exist yet, don't log anything
+        pass
+
+    def response_add(self, request, obj, post_url_continue=None):
+        self.message_user(
+            request, _('%s was queued, it will be processed shortly.') % obj,
+            messages.SUCCESS)
+        return HttpResponseRedirect(
+            reverse('admin:sharekernel_importjob_change', args=(obj.pk,)))
+
 
 class ImportableMixin(object):
     def __init__(self, *args, **kwargs):
@@ -1,39 +1,61 @@
-from pathlib import Path
+import os
 
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.template.defaultfilters import pluralize
 
 from vino.sharekernel.models import SourceFile
+from vino.sharekernel.models.datafile import datafile_path
 
 from .listfiles import Command as BaseCommand
 
 
 class Command(BaseCommand):
-    ROOT = Path(default_storage.location)
-
     help = (
         "Clean up orphan sourcefile entries from database, and media "
         "files that are not referenced anymore. Eventually clean up empty "
         "directories that may remain. Uploaded files and empty directories "
-        f"are searched in {ROOT} directory."
+        "are searched in media root directory."
     )
 
-    @classmethod
-    def iterfiles(cls):
-        """Iterate over all media files in ``ROOT`` directory."""
-        for filepath in cls.ROOT.glob("**/*"):
-            if filepath.is_file():
-                yield filepath.relative_to(cls.ROOT)
+    @property
+    def root(self):
+        return Path(default_storage.location)
+
+    @property
+    def cache(self):
+        return self.root / settings.DERIVED_CACHE_DIR
+
+    def iterfiles(self, directory=None):
+        """Iterate over all media files in media root directory, except derived
+        data cache which is managed by ``DerivedCache`` class."""
+        with os.scandir(directory or self.root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if Path(entry.path) != self.cache:
+                        yield from self.iterfiles(entry.path)
+                elif entry.is_file():
+                    yield Path(entry.path).relative_to(self.root)
+
+    def load_references(self):
+        """Set of paths referenced in database along with their trailing
+        parts, so that legacy absolute or prefixed paths match media files
+        relative paths."""
+        references = set()
+        for path in self.iterpaths():
+            parts = PurePosixPath(path).parts
+            references.update('/'.join(parts[i:]) for i in range(len(parts)))
+        return references
 
     def is_orphan(self, path):
-        """Return True if ``path`` is not found anywhere in database."""
-        query = None
-        for field in self.filefields:
-            qs = field.model.objects
-            has_path = {f"{field.name}__endswith": path}
-            subquery = qs.filter(**has_path).values_list('pk', flat=True)
-            query = subquery if query is None else query.union(subquery)
-        return not query.exists()
+        """Return True if ``path`` is not found anywhere in database, nor
+        the datafile it is a sidecar of, such as its metadata."""
+        if path.as_posix() in self.references:
+            return False
+        datafile = datafile_path(path)
+        return datafile is None or datafile.as_posix() not in self.references
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -58,6 +80,7 @@ class Command(BaseCommand):
             sf_cleaned, _ = sf_orphan.delete()
 
         # Handle orphan media files
+        self.references = self.load_references()
         up_count = up_orphan_count = up_cleaned = 0
         verb = "Remove" if self.force else "Would remove"
         for filepath in self.iterfiles():
@@ -67,14 +90,14 @@ class Command(BaseCommand):
                 self.stdout.write(f"{verb} {filepath}...")
                 if self.force:
                     up_cleaned += 1
-                    self.ROOT.joinpath(filepath).unlink()
+                    self.root.joinpath(filepath).unlink()
         if not self.force:
             up_cleaned = up_orphan_count
 
         # Handle potential empty directories
         empty_dirs = 0
         # Iterate over directories ensuring deepest ones are listed first
-        for dirpath in reversed(sorted(self.ROOT.glob("**"))):
+        for dirpath in reversed(sorted(self.root.glob("**"))):
             if not any(dirpath.iterdir()):
                 if self.force:
                     dirpath.rmdir()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from vino.sharekernel.models import Kernel
+from vino.sharekernel.models.datafile import DATA_SUFFIX
+
+
+class Command(BaseCommand):
+    help = (
+        f"Make datafile from sourcefiles in {DATA_SUFFIX} binary format for "
+        f"each Kernel in sharekernel database that still has a datafile in "
+        f"an older format. Old datafiles are left as is, use cleanfiles "
+        f"command to remove them."
+    )
+
+    def handle(self, *args, **kwargs):
+        for kernel in Kernel.objects.all():
+            if kernel.datafile.name.endswith(DATA_SUFFIX):
+                continue
+            self.stdout.write(f"Convert datafile for {kernel!r}...")
+            kernel.update_datafile()
+            kernel.save()
+        self.stdout.write("All done!")
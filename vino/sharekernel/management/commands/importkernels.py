@@ -0,0 +1,177 @@
+import csv
+import time
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.files import File
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from vino.sharekernel.models import Kernel, SourceFile
+from vino.sharekernel.models.datafile import build_datafile, sources_hash
+from vino.sharekernel.utils import media_save_hashed, sorted_by_size
+
+
+DATA_SUFFIXES = ('.dat', '.txt', '.csv')
+METADATA_SUFFIX = '_metadata.txt'
+
+
+def pair_files(directory):
+    """Find metadata and data files of each kernel in `directory` and its
+    subdirectories, following samples naming conventions:
+    ``<name>_metadata.txt`` goes with ``<name>.<ext>`` or
+    ``<name>_data.<ext>``, ``<name>.txt`` goes with ``<name>.dat``."""
+    directory = Path(directory)
+    for subdirectory in [directory, *sorted(p for p in directory.rglob('*') if p.is_dir())]:
+        files = {p.name: p for p in sorted(subdirectory.iterdir()) if p.is_file()}
+        paired = set()
+        for name, path in files.items():
+            if name.endswith(METADATA_SUFFIX):
+                stem = name[:-len(METADATA_SUFFIX)]
+                candidates = [stem + s for s in DATA_SUFFIXES]
+                candidates += [stem + '_data' + s for s in DATA_SUFFIXES]
+            elif path.suffix == '.dat':
+                candidates = [path.stem + '.txt']
+            else:
+                continue
+            for candidate in candidates:
+                if candidate in files and candidate not in paired and name not in paired:
+                    paired.update((name, candidate))
+                    metadata, data = (path, files[candidate]) if path.suffix != '.dat' else (files[candidate], path)
+                    yield metadata, data
+                    break
+
+
+def read_manifest(manifest):
+    """Read kernels files from a CSV `manifest`, one kernel per row,
+    metadata file first, paths being relative to manifest directory. Empty
+    rows and rows starting with ``#`` are ignored."""
+    root = Path(manifest).parent
+    with open(manifest, newline='') as fp:
+        for row in csv.reader(fp):
+            files = [f.strip() for f in row if f.strip()]
+            if files and not files[0].startswith('#'):
+                yield tuple(root / f for f in files)
+
+
+def prepare(files):
+    """Save source `files` to media root, parse them and write their
+    datafile with its levels of detail, in a worker process."""
+    saved = []
+    for path in files:
+        with open(path, 'rb') as fp:
+            saved.append(media_save_hashed(SourceFile.FILE_PATH, File(fp, name=Path(path).name)))
+    saved = sorted_by_size(saved)
+    metadata, path, size = build_datafile(Kernel.DATAFILE_PATH, saved)
+    return saved, metadata, path, size, sources_hash(saved)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import kernels in bulk from directories, where metadata and data "
+        "files are paired by name, or from CSV manifests listing files of "
+        "each kernel. Files are parsed in parallel and kernels are saved "
+        "in batched transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user', type=str, help='owner name of created objects')
+        parser.add_argument(
+            'paths', nargs='+', type=Path, help='directories or manifests')
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            type=int,
+            default=None,
+            help="Number of worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            default=50,
+            help="Number of kernels saved per transaction (default: %(default)s).",
+        )
+
+    def find_kernels(self, paths):
+        for path in paths:
+            if path.is_dir():
+                yield from pair_files(path)
+            elif path.is_file():
+                yield from read_manifest(path)
+            else:
+                raise CommandError(f"{path} not found.")
+
+    def handle(self, user, paths, jobs, batch_size, *args, verbosity, **kwargs):
+        self.verbosity = verbosity
+        try:
+            owner = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f"User {user} does not exist.")
+
+        kernels = list(self.find_kernels(paths))
+        for files in kernels:
+            for f in files:
+                if not f.is_file():
+                    raise CommandError(f"File {f} not found.")
+        self.stdout.write(f"Import {len(kernels)} kernels...")
+
+        # Don't share database connections with worker processes
+        connections.close_all()
+
+        start = time.perf_counter()
+        done = failed = nfiles = nbytes = 0
+        batch = []
+
+        def save_batch():
+            nonlocal done
+            # Kernels and their related models of a batch are saved in a
+            # single transaction
+            with transaction.atomic():
+                for saved, metadata, path, size, source_hash in batch:
+                    sourcefiles = SourceFile.from_media(saved)
+                    kernel = Kernel.from_datafile(
+                        metadata, path, size, sourcefiles, owner=owner,
+                        source_hash=source_hash)
+                    if self.verbosity > 1:
+                        self.stdout.write(f"Imported {kernel!r}")
+            done += len(batch)
+            batch.clear()
+
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"Saved {done}/{len(kernels)} kernels, "
+                f"{nfiles / elapsed:.1f} files/s, {nbytes / elapsed / 1024**2:.1f} MB/s")
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(prepare, files): files for files in kernels}
+            for future in as_completed(futures):
+                files = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    names = ', '.join(map(str, files))
+                    self.stderr.write(self.style.ERROR(f"Can't import {names}: {e}"))
+                    continue
+                nfiles += len(files)
+                nbytes += sum(f.stat().st_size for f in files)
+                batch.append(result)
+                if len(batch) >= batch_size:
+                    save_batch()
+
+        if batch:
+            save_batch()
+
+        elapsed = time.perf_counter() - start
+        msg = (
+            f"Imported {done} kernels from {nfiles} files "
+            f"({nbytes / 1024**2:.1f} MB) in {elapsed:.1f}s: "
+            f"{nfiles / elapsed:.1f} files/s, {nbytes / elapsed / 1024**2:.1f} MB/s"
+        )
+        self.stdout.write(self.style.SUCCESS(msg))
+        if failed:
+            raise CommandError(f"Failed to import {failed} kernels.")
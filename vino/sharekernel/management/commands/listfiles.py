@@ -17,6 +17,13 @@ class Command(BaseCommand):
                     if isinstance(field, filefield_type):
                         self.filefields.append(field)
 
+    def iterpaths(self):
+        """Iterate over paths of files referenced in database, with a single
+        query per file field."""
+        for field in self.filefields:
+            qs = field.model.objects.exclude(**{field.name: ''})
+            yield from qs.values_list(field.name, flat=True).iterator()
+
     def handle(self, *args, **kwargs):
         query = None
         for field in self.filefields:
@@ -1,17 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Prefetch
+
+from vino.sharekernel.models import Kernel, SourceFile
+from vino.sharekernel.models.datafile import build_datafile, sources_hash
+
 
-from vino.sharekernel.models import Kernel
+def rebuild(files):
+    _, path, _ = build_datafile(Kernel.DATAFILE_PATH, files)
+    return path
 
 
 class Command(BaseCommand):
     help = (
         "Make datafile from sourcefiles for each Kernel in sharekernel "
-        "database, overwriting existing one."
+        "database, overwriting existing one. Kernels whose sourcefiles and "
+        "datafile version didn't change since their datafile was made are "
+        "skipped, unless --force option is used."
     )
 
-    def handle(self, *args, **kwargs):
-        for kernel in Kernel.objects.all():
-            self.stdout.write(f"Make datafile for {kernel!r}...")
-            kernel.update_datafile()
-            kernel.save()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of worker processes (default: %(default)s).",
+        )
+        parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            help="Make datafiles of all kernels, even unchanged ones.",
+        )
+
+    @staticmethod
+    def has_datafile(kernel):
+        return bool(kernel.datafile) and kernel.datafile.storage.exists(kernel.datafile.name)
+
+    def handle(self, *args, jobs, force, **kwargs):
+        kernels = list(Kernel.objects.prefetch_related(
+            Prefetch('sourcefiles', queryset=SourceFile.objects.order_by('pk'))))
+        files = [[sf.file for sf in kernel.sourcefiles.all()] for kernel in kernels]
+
+        # Don't share database connections with worker processes
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # Only source files which aren't stored by content are read
+            hashes = list(executor.map(sources_hash, files))
+
+            outdated = [
+                (kernel, kernel_files, source_hash)
+                for kernel, kernel_files, source_hash in zip(kernels, files, hashes)
+                if force or source_hash != kernel.source_hash or not self.has_datafile(kernel)
+            ]
+            self.stdout.write(
+                f"Skip {len(kernels) - len(outdated)} unchanged kernels, "
+                f"make datafile for {len(outdated)} kernels...")
+
+            paths = executor.map(rebuild, [kernel_files for _, kernel_files, _ in outdated])
+            for (kernel, _, source_hash), path in zip(outdated, paths):
+                self.stdout.write(f"Made datafile for {kernel!r}")
+                kernel.set_datafile(path)
+                kernel.source_hash = source_hash
+                kernel.save()
+
         self.stdout.write("All done!")
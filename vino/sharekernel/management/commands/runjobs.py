@@ -0,0 +1,81 @@
+import signal
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from vino.sharekernel.models import ImportJob
+from vino.sharekernel.models.importjob import worker_name
+
+
+def work(stop, poll_interval, once=False):
+    """Run queued import jobs until `stop` event is set, or until queue is
+    empty if `once` is true."""
+    # Parent process sets `stop` on interruption, so that running jobs are
+    # never left half done
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Don't share database connections of parent process
+    connections.close_all()
+
+    worker = worker_name()
+    while not stop.is_set():
+        job = ImportJob.claim(worker)
+        if job is not None:
+            job.run()
+        elif once:
+            break
+        else:
+            stop.wait(poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a pool of local workers which import kernels queued in "
+        "database, for example from the admin import form."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=2,
+            help="Number of worker processes (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.,
+            help="Seconds to wait before polling an empty queue again "
+                 "(default: %(default)s).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there is no more pending job.",
+        )
+
+    def handle(self, *args, workers, poll_interval, once, **kwargs):
+        pending = ImportJob.objects.pending().count()
+        self.stdout.write(f"Start {workers} workers, {pending} pending jobs...")
+
+        stop = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(target=work, args=(stop, poll_interval, once))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        # Let workers finish their current job on termination
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Wait for running jobs to finish...")
+            stop.set()
+            for process in processes:
+                process.join()
+
+        self.stdout.write("All done!")
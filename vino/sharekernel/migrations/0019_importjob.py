@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_currentuser.db.models.fields
+import django_currentuser.middleware
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sharekernel', '0018_sourcefile_file_relative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.IntegerField(choices=[(1, 'Active'), (2, 'Deleted')], default=1)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Running'), (3, 'Done'), (4, 'Failed')], default=1)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('step', models.CharField(blank=True, max_length=200)),
+                ('error', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=200)),
+                ('date_started', models.DateTimeField(blank=True, null=True)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+                ('kernel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importjobs', to='sharekernel.Kernel')),
+                ('owner', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('sourcefiles', models.ManyToManyField(related_name='importjobs', to='sharekernel.SourceFile', verbose_name='Source files')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharekernel', '0019_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kernel',
+            name='source_hash',
+            field=models.CharField(blank=True, editable=False, max_length=80),
+        ),
+    ]
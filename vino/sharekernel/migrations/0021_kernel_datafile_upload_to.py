@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharekernel', '0020_kernel_source_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kernel',
+            name='datafile',
+            field=models.FileField(upload_to='kernels/sha256', verbose_name='Data file'),
+        ),
+    ]
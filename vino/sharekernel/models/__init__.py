@@ -3,10 +3,11 @@ from .kernel import (
     ParameterSet, DataFormat, Software, SourceFile, Kernel, BarGridKernel,
     KdTreeKernel
 )
+from .importjob import ImportJob
 from .fields import StatementsField, EquationsField, InequationsField
 
 __all__ = [
     'Symbol', 'ViabilityProblem', 'ParameterSet', 'DataFormat', 'Software',
     'SourceFile', 'Kernel', 'BarGridKernel', 'KdTreeKernel', 'StatementsField',
-    'EquationsField', 'InequationsField',
+    'EquationsField', 'InequationsField', 'ImportJob',
 ]
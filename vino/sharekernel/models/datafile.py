@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import io
 import os
-import shutil
+import hashlib
 
+from functools import partial
 from typing import Sequence
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 
+import numpy as np
+
+from django.conf import settings
 from django.utils.text import slugify
 from django.core.files.storage import default_storage
 
@@ -14,36 +19,196 @@ import vino as vn
 
 from vino.typing import AnyPath
 
-from ..utils import hash_file
+from ..cache import data_cache, derive, PPA
+from ..utils import HashingWriter, stored_hash
 
 
-def make_datafile(path: AnyPath, files: Sequence[AnyPath]) -> tuple[vn.Vino, Path]:
-    # Create a Vino object from files
-    root = Path(default_storage.location)
-    vno = vn.load(*[
-        filepath if filepath.is_absolute() else root.joinpath(filepath)
-        for filepath in map(Path, files)
-    ])
+# Datafiles are stored as NPY files so that they can be memory mapped, with
+# their metadata in a sidecar text file
+DATA_SUFFIX = '.npy'
+# Bump it when datafiles or their levels of detail are written differently,
+# so that `makedatafiles` command rebuilds them
+DATAFILE_VERSION = 1
+METADATA_SUFFIX = '_metadata.txt'
+# Levels of detail of datafile are stored next to it in a NPZ container,
+# see `write_lod`
+LOD_SUFFIX = '_lod.npz'
+LOD_PREFIX = 'lod_'
+
+
+def metadata_path(datafile: AnyPath) -> Path:
+    """Path of the metadata sidecar file of `datafile`."""
+    path = Path(os.fsdecode(datafile))
+    return path.with_name(path.stem + METADATA_SUFFIX)
+
+
+def lod_path(datafile: AnyPath) -> Path:
+    """Path of the levels of detail file of `datafile`."""
+    path = Path(os.fsdecode(datafile))
+    return path.with_name(path.stem + LOD_SUFFIX)
+
+
+def datafile_path(sidecar: AnyPath) -> Path | None:
+    """Path of the datafile `sidecar` file belongs to, if any."""
+    path = Path(os.fsdecode(sidecar))
+    for suffix in (METADATA_SUFFIX, LOD_SUFFIX):
+        if path.name.endswith(suffix):
+            return path.with_name(path.name[:-len(suffix)] + DATA_SUFFIX)
+    return None
+
 
-    # Save the Vino to a temporary file in CSV format
-    temp = NamedTemporaryFile(mode='w', newline='', delete=False)
-    vn.save_csv(temp, vno)
-    temp.close()
+def load_datafile(datafile: AnyPath) -> vn.Vino:
+    path = Path(os.fsdecode(datafile))
+
+    # Legacy datafiles were stored in RichCSV format
+    if path.suffix != DATA_SUFFIX:
+        return vn.load(path)
+
+    return vn.load(path, metadata_path(path), mmap=True)
+
+
+def write_datafile(path: AnyPath, vno: vn.Vino) -> Path:
+    # Save the Vino to temporary files in NPY format, hashing their content
+    # along the way, data first. They are written in datafiles directory so
+    # that they are moved rather than copied to their final path
+    hasher = hashlib.sha256()
+    directory = Path(default_storage.path(path))
+    directory.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile(mode='wb', dir=directory, delete=False) as data:
+        vn.save_npy(HashingWriter(data, hasher), vno)
+    with NamedTemporaryFile(mode='wb', dir=directory, delete=False) as metadata:
+        with io.TextIOWrapper(HashingWriter(metadata, hasher)) as text:
+            vn.save_metadata(text, vno.metadata)
 
     # Python temporary files doesn't take umask into account, need to chmod it
-    os.chmod(temp.name, 0o0644)
+    for temp in (data.name, metadata.name):
+        os.chmod(temp, 0o0644)
 
     # Generate datafile name and path
     parts = (
         vno.metadata['viabilityproblem.title'],
         vno.metadata['results.title'],
-        hash_file(temp.name, algorithm='sha256'),
+        hasher.hexdigest(),
     )
-    name = '_'.join(slugify(p) for p in parts) + '.csv'
-    datafile = Path(default_storage.path(Path(path) / name))
+    name = '_'.join(slugify(p) for p in parts) + DATA_SUFFIX
+    datafile = directory / hasher.hexdigest()[:2] / name
+
+    # Datafiles are named after their content, which is stored once
+    if datafile.exists() and metadata_path(datafile).exists():
+        for temp in (data.name, metadata.name):
+            os.unlink(temp)
+        return datafile
 
-    # Move temporary file to this path
+    # Move temporary files to this path, datafile last so that it never
+    # exists without its metadata
     datafile.parent.mkdir(parents=True, exist_ok=True)
-    shutil.move(temp.name, datafile)
+    os.replace(metadata.name, metadata_path(datafile))
+    os.replace(data.name, datafile)
+
+    return datafile
+
+
+def media_paths(files: Sequence[AnyPath]) -> list[Path]:
+    """Absolute paths of files, relative to media root or not."""
+    root = Path(default_storage.location)
+    return [
+        filepath if filepath.is_absolute() else root.joinpath(filepath)
+        for filepath in map(Path, files)
+    ]
+
+
+def load_files(files: Sequence[AnyPath]) -> vn.Vino:
+    """Create a Vino object from files."""
+    return vn.load(*media_paths(files))
+
+
+def sources_hash(files: Sequence[AnyPath]) -> str:
+    """Identify datafile built from `files` by current `DATAFILE_VERSION`.
+
+    Files content hashes are combined in sorted order, whatever the order of
+    `files`, and are taken from their path when they are stored by content
+    so that those files aren't read, see `stored_hash`.
+    """
+    digests = sorted(stored_hash(path) for path in media_paths(files))
+    return f"{DATAFILE_VERSION}:{hashlib.sha256(''.join(digests).encode()).hexdigest()}"
+
+
+def make_datafile(path: AnyPath, files: Sequence[AnyPath]) -> tuple[vn.Vino, Path]:
+    vno = load_files(files)
+    return vno, write_datafile(path, vno)
+
+
+def build_datafile(path: AnyPath, files: Sequence[AnyPath]) -> tuple[vn.Metadata, Path, int]:
+    """Make datafile from `files` along with its levels of detail, return its
+    metadata, path and data count rather than data itself so that it can be
+    called in worker processes."""
+    vno, datafile = make_datafile(path, files)
+    write_lod(datafile, vno)
+    return vno.metadata, datafile, vno.count
+
+
+def lod_levels(vno: vn.Vino) -> list[int]:
+    """Power of two ppa of the levels of detail of `vno`, from
+    ``LOD_MIN_PPA`` up to ``LOD_MAX_PPA``, coarser than `vno` itself for grids
+    and with at most ``LOD_MAX_CELLS`` cells."""
+    max_ppa = settings.LOD_MAX_PPA
+    if isinstance(vno, vn.RegularGrid):
+        max_ppa = min(max_ppa, int(np.max(vno.ppa)) - 1)
+
+    levels = []
+    ppa = settings.LOD_MIN_PPA
+    while ppa <= max_ppa and ppa ** vno.dim <= settings.LOD_MAX_CELLS:
+        levels.append(ppa)
+        ppa *= 2
+    return levels
+
+
+def write_lod(datafile: AnyPath, vno: vn.Vino) -> Path | None:
+    """Precompute levels of detail of `vno` as bar grids resampled at
+    `lod_levels` ppa, so that requests at a lower resolution than the one
+    of `datafile` are resampled from them rather than from full data.
+
+    Grid levels are never finer than `vno` on any axis. Levels are stored in
+    a NPZ container next to `datafile`, as members named after their ppa,
+    the coarsest one being also stored as container data.
+    """
+    levels = lod_levels(vno)
+    if not levels:
+        return None
+
+    members = {}
+    for ppa in levels:
+        level_ppa = np.minimum(ppa, vno.ppa) if isinstance(vno, vn.RegularGrid) else ppa
+        members[f'{LOD_PREFIX}{ppa}'] = derive(vno, 'bargrid', level_ppa)
+
+    path = lod_path(datafile)
+    with NamedTemporaryFile(mode='wb', dir=path.parent, delete=False) as lod:
+        vn.save_npz(lod, members[f'{LOD_PREFIX}{levels[0]}'], **members)
+    os.chmod(lod.name, 0o0644)
+    os.replace(lod.name, path)
+
+    return path
+
+
+def load_lod_level(path: Path, name: str) -> vn.Vino:
+    with vn.open_npz(path, mmap=True) as npz:
+        return npz[name]
+
+
+def load_lod(datafile: AnyPath, ppa: PPA) -> vn.Vino | None:
+    """Coarsest level of detail of `datafile` which is at least as fine as
+    `ppa` on every axis, if any."""
+    path = lod_path(datafile)
+    try:
+        with vn.open_npz(path) as npz:
+            names = [name for name in npz if name.startswith(LOD_PREFIX)]
+    except (OSError, ValueError):
+        return None
 
-    return vno, datafile
+    requested = np.asarray(ppa)
+    for name in sorted(names, key=lambda name: int(name[len(LOD_PREFIX):])):
+        load = partial(load_lod_level, name=name)
+        level = data_cache.get(path, load, key=f'{path}:{name}')
+        if np.all(requested <= level.ppa):
+            return level
+    return None
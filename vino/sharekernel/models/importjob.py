@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import socket
+import logging
+import traceback
+
+from datetime import timedelta
+from typing import IO, AnyStr, Optional
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .entity import Entity, EntityQuerySet
+from .sourcefile import SourceFile
+from .kernel import Kernel
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJobQuerySet(EntityQuerySet):
+    def pending(self):
+        return self.filter(status=ImportJob.PENDING).order_by('date_created', 'pk')
+
+    def unfinished(self):
+        return self.filter(status__in=(ImportJob.PENDING, ImportJob.RUNNING))
+
+    def retryable(self):
+        """Failed jobs, and running jobs started more than
+        ``IMPORT_JOB_TIMEOUT`` seconds ago whose worker probably died."""
+        stalled = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+        return self.filter(
+            Q(status=ImportJob.FAILED) | Q(status=ImportJob.RUNNING, date_started__lt=stalled))
+
+
+class ImportJob(Entity):
+    """
+    Kernel import queued in database, so that uploaded files are parsed,
+    converted to a datafile and their derived data built by background
+    workers instead of web requests, see `runjobs` command.
+    """
+    PENDING = 1
+    RUNNING = 2
+    DONE = 3
+    FAILED = 4
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    objects = ImportJobQuerySet.as_manager()
+
+    sourcefiles = models.ManyToManyField(
+        SourceFile, related_name='importjobs', verbose_name="Source files")
+    status = models.IntegerField(choices=STATUSES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    step = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=200, blank=True)
+    date_started = models.DateTimeField(null=True, blank=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+    kernel = models.ForeignKey(
+        Kernel, models.SET_NULL, null=True, blank=True, related_name='importjobs')
+
+    def __str__(self):
+        return f"Import #{self.pk}"
+
+    @classmethod
+    def submit(cls, *files: IO[AnyStr], owner: User | None = None) -> ImportJob:
+        """Save uploaded `files` as sourcefiles and queue their import."""
+        sourcefiles = SourceFile.from_files(*files)
+        with transaction.atomic():
+            job = cls.objects.create(owner=owner)
+            job.sourcefiles.add(*sourcefiles)
+        return job
+
+    @classmethod
+    def claim(cls, worker: str) -> Optional[ImportJob]:
+        """Mark oldest pending job as run by `worker` and return it, if any.
+
+        Claiming is a conditional update so that concurrent workers never run
+        a same job, whatever the database backend.
+        """
+        for pk in cls.objects.pending().values_list('pk', flat=True)[:10]:
+            claimed = cls.objects.filter(pk=pk, status=cls.PENDING).update(
+                status=cls.RUNNING, worker=worker, progress=0, step='', error='',
+                date_started=timezone.now(), date_finished=None)
+            if claimed:
+                return cls.objects.get(pk=pk)
+        return None
+
+    def claimed(self) -> models.QuerySet[ImportJob]:
+        """This job as long as it wasn't claimed again since it was claimed by
+        its current worker, see `retry`."""
+        return type(self).objects.filter(
+            pk=self.pk, worker=self.worker, date_started=self.date_started)
+
+    def report(self, step: str, progress: int) -> None:
+        self.step, self.progress = step, progress
+        self.claimed().update(step=step, progress=progress)
+
+    def run(self) -> None:
+        try:
+            sourcefiles = list(self.sourcefiles.order_by('pk'))
+            self.kernel = Kernel.from_sourcefiles(
+                sourcefiles, owner=self.owner, progress=self.report)
+        except Exception:
+            logger.exception("%s failed", self)
+            self.status = self.FAILED
+            self.error = traceback.format_exc()
+        else:
+            self.status = self.DONE
+            self.step, self.progress = 'Done', 100
+        self.date_finished = timezone.now()
+
+        # Result of a job queued again in the meantime is dropped, so that it
+        # doesn't overwrite the one of its new run
+        finished = self.claimed().update(
+            status=self.status, step=self.step, progress=self.progress,
+            error=self.error, kernel=self.kernel,
+            date_finished=self.date_finished, date_updated=self.date_finished)
+        if not finished:
+            logger.warning("%s was claimed again, drop result of %s", self, self.worker)
+
+    def retry(self) -> bool:
+        """Queue job again if it's retryable, see `ImportJobQuerySet.retryable`."""
+        retried = type(self).objects.retryable().filter(pk=self.pk).update(
+            status=self.PENDING, date_updated=timezone.now())
+        if retried:
+            self.status = self.PENDING
+        return bool(retried)
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
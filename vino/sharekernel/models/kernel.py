@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Optional, IO, AnyStr
+from pathlib import Path
+from typing import Callable, Optional, Sequence, IO, AnyStr
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import QuerySet, Count, Q
 from django.db.models.query import ModelIterable
 from django.utils.functional import cached_property
@@ -11,6 +12,7 @@ from django.contrib.auth.models import User
 import vino as vn
 
 from ..utils import media_relative_path
+from ..cache import data_cache, derived_cache, PPA
 from .entity import EntityWithMetadata, EntityManager
 from .parameterset import ParameterSet
 from .dataformat import DataFormat
@@ -19,7 +21,8 @@ from .sourcefile import SourceFile
 from .viabilityproblem import (ViabilityProblem, ViabilityProblemQuerySet,
                                ViabilityProblemManagerMixin)
 from .symbol import Symbol
-from .datafile import make_datafile
+from .datafile import (build_datafile, load_datafile, load_files, load_lod,
+                       sources_hash, write_datafile, write_lod)
 
 
 class KernelIterable(ModelIterable):
@@ -71,7 +74,7 @@ class Kernel(EntityWithMetadata):
     PREFIX = 'results.'
     IDENTITY = ('title', 'params', 'format', 'software', 'datafile')
     DATA_UNIT = '-'
-    DATAFILE_PATH = 'kernels/%Y/%m/%d'
+    DATAFILE_PATH = 'kernels/sha256'
 
     FORMAT: Optional[str] = None
 
@@ -85,6 +88,8 @@ class Kernel(EntityWithMetadata):
     datafile = models.FileField(upload_to=DATAFILE_PATH, verbose_name="Data file")
     sourcefiles = models.ManyToManyField(SourceFile, verbose_name="Source files")
     size = models.IntegerField(default=0)
+    # Datafile was built from source files with this hash, see `sources_hash`
+    source_hash = models.CharField(max_length=80, blank=True, editable=False)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -116,44 +121,98 @@ class Kernel(EntityWithMetadata):
 
     @cached_property
     def data(self) -> vn.Vino:
-        return vn.load(self.datafile.path)
+        return data_cache.get(self.datafile.path, load_datafile)
 
     @property
     def metadata(self) -> vn.Metadata:
         return self.data.metadata
 
+    def derived(self, target: str, ppa: PPA = None, weight: Optional[str] = None) -> vn.Vino:
+        """Representation of kernel data in `target` format, resampled with
+        `ppa` and weighted by `weight`, see `DerivedCache` class."""
+        return derived_cache.get(self, target, ppa, weight)
+
+    def lod(self, ppa: PPA = None) -> vn.Vino:
+        """Data to resample kernel with `ppa` from: its coarsest level of
+        detail which is fine enough, or kernel data itself."""
+        if ppa is None or ppa == -1:
+            return self.data
+        level = load_lod(self.datafile.path, ppa)
+        return level if level is not None else self.data
+
     @property
     def size_with_unit(self) -> Optional[str]:
         if self.size:
             return f'{self.size} {self.DATA_UNIT}{"s" if self.size > 1 else ""}'
         return None
 
+    def set_datafile(self, path: Path) -> None:
+        old_datafile, self.datafile = self.datafile.name, media_relative_path(path)
+        if old_datafile != self.datafile.name:
+            derived_cache.invalidate(old_datafile)
+            self.__dict__.pop('data', None)
+
     def update_datafile(self) -> None:
         files = [sf.file for sf in self.sourcefiles.order_by('pk').all()]
-        _, path = make_datafile(self.DATAFILE_PATH, files)
-        self.datafile = media_relative_path(path)
+        _, path, _ = build_datafile(self.DATAFILE_PATH, files)
+        self.set_datafile(path)
+        self.source_hash = sources_hash(files)
 
     @classmethod
     def from_files(cls, *files: IO[AnyStr], owner: User | None = None) -> Kernel:
-        sourcefiles = SourceFile.from_files(*files)
+        return cls.from_sourcefiles(SourceFile.from_files(*files), owner=owner)
+
+    @classmethod
+    def from_sourcefiles(
+        cls,
+        sourcefiles: Sequence[SourceFile],
+        owner: User | None = None,
+        progress: Callable[[str, int], None] | None = None,
+    ) -> Kernel:
+        """Import kernel from `sourcefiles`, calling `progress` with current
+        step description and percentage along the way."""
+        report = progress or (lambda step, percent: None)
+
         files = [sf.file for sf in sourcefiles]
-        data, path = make_datafile(cls.DATAFILE_PATH, files)
-        metadata = data.metadata
-
-        # Generate models instances from metadata
-        vp = ViabilityProblem.from_metadata(metadata, owner=owner)
-        fields = {
-            'params': ParameterSet.from_metadata(metadata, vp=vp, owner=owner),
-            'software': Software.from_metadata(metadata, owner=owner),
-            'format': DataFormat.from_metadata(metadata, owner=owner),
-            'datafile': media_relative_path(path),
-            'size': data.count,
-            'owner': owner,
-        }
-        kernel = Kernel.from_metadata(metadata, **fields)
+        report("Parse source files", 0)
+        data = load_files(files)
+        report("Write datafile", 40)
+        path = write_datafile(cls.DATAFILE_PATH, data)
+        report("Build levels of detail", 60)
+        write_lod(path, data)
+        report("Save kernel", 90)
+        return cls.from_datafile(
+            data.metadata, path, data.count, sourcefiles, owner=owner,
+            source_hash=sources_hash(files))
 
-        # Bind to source files
-        kernel.sourcefiles.add(*sourcefiles)
+    @classmethod
+    def from_datafile(
+        cls,
+        metadata: vn.Metadata,
+        path: Path,
+        size: int,
+        sourcefiles: Sequence[SourceFile],
+        owner: User | None = None,
+        source_hash: str = '',
+    ) -> Kernel:
+        """Create kernel and its related models from `metadata` of an
+        already written datafile at `path`."""
+        with transaction.atomic():
+            # Generate models instances from metadata
+            vp = ViabilityProblem.from_metadata(metadata, owner=owner)
+            fields = {
+                'params': ParameterSet.from_metadata(metadata, vp=vp, owner=owner),
+                'software': Software.from_metadata(metadata, owner=owner),
+                'format': DataFormat.from_metadata(metadata, owner=owner),
+                'datafile': media_relative_path(path),
+                'size': size,
+                'source_hash': source_hash,
+                'owner': owner,
+            }
+            kernel = Kernel.from_metadata(metadata, **fields)
+
+            # Bind to source files
+            kernel.sourcefiles.add(*sourcefiles)
 
         # FIXME Should check if declared format in metadata match detected one
         # FIXME Should check if column count is valid
@@ -1,22 +1,33 @@
 from pathlib import Path
-from typing import IO, AnyStr
+from typing import IO, AnyStr, Iterable
 
 from django.db import models
+from django.db.models import Count, Q
 from django.core.files.storage import default_storage
 
 from .entity import Entity, EntityQuerySet
-from ..utils import sorted_by_size, media_save
+from ..utils import sorted_by_size, media_save_hashed, media_relative_path, StringPath
 
 
 class SourceFileQuerySet(EntityQuerySet):
+    def with_refcount(self):
+        """Annotate source files with the number of kernels and unfinished
+        import jobs they are used by, as `refcount`."""
+        from .importjob import ImportJob
+        unfinished = Q(importjobs__status__in=(ImportJob.PENDING, ImportJob.RUNNING))
+        kernels = Count('kernel', distinct=True)
+        jobs = Count('importjobs', filter=unfinished, distinct=True)
+        return self.annotate(refcount=kernels + jobs)
+
     def orphans(self):
-        return self.exclude(
-            pk__in=SourceFile.kernel_set.through.objects.values('sourcefile'))
+        """Source files with a null reference count, see `with_refcount`."""
+        return self.with_refcount().filter(refcount=0)
 
 
 class SourceFile(Entity):
     ROOT = default_storage.location
-    FILE_PATH = 'import/%Y/%m/%d'
+    # Files are stored by content, see `media_save_hashed`
+    FILE_PATH = 'import/sha256'
 
     objects = SourceFileQuerySet.as_manager()
 
@@ -24,10 +35,15 @@ class SourceFile(Entity):
 
     @classmethod
     def from_files(cls, *files: IO[AnyStr]):
-        saved_files = [media_save(cls.FILE_PATH, f) for f in files]
+        return cls.from_media([media_save_hashed(cls.FILE_PATH, f) for f in files])
+
+    @classmethod
+    def from_media(cls, paths: Iterable[StringPath]):
+        """Source files of files already saved in media root, existing ones
+        being reused so that a same stored file has a single source file."""
         return [
-            cls.objects.get_or_create(file=Path(f).relative_to(cls.ROOT))[0]
-            for f in sorted_by_size(saved_files)
+            cls.objects.get_or_create(file=media_relative_path(Path(f)))[0]
+            for f in sorted_by_size(paths)
         ]
 
     def __str__(self):
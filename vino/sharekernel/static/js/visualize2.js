@@ -149,6 +149,62 @@ const FORMAT_BARGRID = 'bars',
       FORMAT_REGULARGRID = 'regulargrid',
       FORMAT_KDTREE = 'kdtree';
 
+// Binary API responses, see vino/sharekernel/views/binary.py
+const BINARY_MEDIA_TYPE = 'application/octet-stream',
+      BINARY_HEADER_OFFSET = 8,
+      TYPED_ARRAYS = {
+          int8: Int8Array, uint8: Uint8Array,
+          int16: Int16Array, uint16: Uint16Array,
+          int32: Int32Array, uint32: Uint32Array,
+          float32: Float32Array, float64: Float64Array
+      };
+
+function decodeBinary(buffer) {
+    const length = new DataView(buffer).getUint32(4, true),
+          header = new Uint8Array(buffer, BINARY_HEADER_OFFSET, length),
+          start = BINARY_HEADER_OFFSET + length;
+
+    // Replace arrays references by typed arrays viewing response buffer
+    return JSON.parse(new TextDecoder().decode(header), (key, value) => {
+        const ref = value && value.$array;
+        return ref ? new TYPED_ARRAYS[ref.dtype](buffer, start + ref.offset, ref.length) : value;
+    });
+}
+
+function fetchData(url) {
+    return fetch(url, {headers: {Accept: `${BINARY_MEDIA_TYPE}, application/json;q=0.9`}})
+        .then(r => r.headers.get('Content-Type') == BINARY_MEDIA_TYPE ?
+                   r.arrayBuffer().then(decodeBinary) :
+                   r.json());
+}
+
+// Rebuild viable points coordinates of a regular grid from its cells mask,
+// packed into bits in little bit order, cells being in C order
+function gridPoints(grid, variables, mask) {
+    const bytes = Uint8Array.from(mask),
+          ppa = grid.ppa, dim = ppa.length;
+    let count = 0;
+    for (let b of bytes)
+        for (; b; b &= b - 1)
+            count++;
+
+    const columns = ppa.map(() => new Float64Array(count)),
+          index = new Array(dim);
+    for (let i = 0, n = 0; n < count; i++) {
+        if (!(bytes[i >> 3] & (1 << (i & 7))))
+            continue;
+        for (let a = dim - 1, r = i; a >= 0; a--) {
+            index[a] = r % ppa[a];
+            r = Math.floor(r / ppa[a]);
+        }
+        for (let a = 0; a < dim; a++)
+            columns[a][n] = grid.origin[a] + index[a] * grid.unit[a];
+        n++;
+    }
+
+    return variables.map(v => columns[v.order]);
+}
+
 const INFO_PROPERTIES = [
     'id', 'vp', 'title', 'dim', 'format', 'size', 'axes', 'variables',
     'original', 'grid'
@@ -196,6 +252,9 @@ class VinoPlot {
               weights = data.distances || data.weights || {};
         let V, trace;
 
+        if (data.mask && !data.values)
+            data.values = gridPoints(data.grid, data.variables, data.mask);
+
         if ((V = data.shapes))
             trace = shapes(V[0], V[1], color);
         else if ((V = data.values))
@@ -244,12 +303,13 @@ class VinoPlot {
     }
 
     fetch(url, callback) {
-        let promise = fetch(url).then(r => r.json()).then(callback);
+        let promise = fetchData(url).then(callback);
         return this;
     }
 
     trace(url/*, urlN...*/) {
-        let requests = Array.from(arguments).map(url => fetch(url));
+        // URLs may also be given as promises of already requested data
+        let requests = Array.from(arguments).map(url => typeof url === 'string' ? fetchData(url) : url);
         this.promises = this.promises.concat(requests);
         return this;
     }
@@ -257,7 +317,6 @@ class VinoPlot {
     show() {
         this.loading(true);
         Promise.all(this.promises)
-            .then(results => Promise.all(results.map(r => r.json())))
             .then(chunks => this.plot(chunks).keepInfo(chunks))
             .then(self => this.postprocess.forEach(fn => fn.call(self, self.info)))
             .catch(error => console.log('ERROR FETCHING:', error))
@@ -377,9 +436,11 @@ function hookVisualization(element) {
               shapes: form.elements['show-shapes']
           },
           switchPlaneButton = document.getElementById('switch-plane-' + vzId),
-          infos = new Map();
+          infos = new Map(),
+          sectionStacks = new Map();
 
-    let state = {};
+    let state = {},
+        scrubAxis = null;
 
     function getRanges() {
         return sectionForm.querySelectorAll('.axis-container input[type="range"]');
@@ -425,7 +486,7 @@ function hookVisualization(element) {
         return true;
     }
 
-    function vinoURL(state, shapes) {
+    function vinoURL(state, shapes, stack) {
         const format = ({
                   'bars': 'bargrid',
                   'regulargrid': `regulargrid${state.distance?'+distance':''}`
@@ -436,11 +497,51 @@ function hookVisualization(element) {
         if (shapes && state.shapes)
             return `${base}shapes/`;
         else if (state.section)
-            return `${base}section/${state.plane}/${state.at}/`;
+            return `${base}${stack ? 'sections' : 'section'}/${state.plane}/${state.at}/`;
+        else if (state.format == 'regulargrid')
+            return `${base}mask/`;
 
         return base;
     }
 
+    // Fetch sections along the whole range of the slider being moved at once,
+    // so that scrubbing through it costs a single request
+    function sectionData(state) {
+        const ranges = Array.from(getRanges()),
+              i = Math.max(0, ranges.findIndex(r => parseInt(r.dataset.axis) === scrubAxis)),
+              at = state.at.split(',').map(x => parseInt(x)),
+              stackAt = at.map((x, j) => j == i ? `0-${ranges[i].max}` : x).join(','),
+              url = vinoURL(Object.assign({}, state, {at: stackAt}), false, true);
+
+        if (!sectionStacks.has(url)) {
+            if (sectionStacks.size >= 16)
+                sectionStacks.clear();
+            sectionStacks.set(url, fetchData(url));
+            sectionStacks.get(url).catch(() => sectionStacks.delete(url));
+        }
+
+        return sectionStacks.get(url).then(data => sectionChunk(data, at));
+    }
+
+    // Section of a stack of sections at `at` position
+    function sectionChunk(data, at) {
+        const index = data.positions ? data.positions.findIndex(p => p.every((x, j) => x == at[j])) : -1;
+
+        if (index < 0)
+            return data;
+
+        const grid = data.grid,
+              plane = data.axes,
+              section = {
+                  ppa: plane.map(a => grid.ppa[a]),
+                  origin: plane.map(a => grid.origin[a]),
+                  unit: plane.map(a => grid.unit[a])
+              },
+              values = gridPoints(section, [{order: 0}, {order: 1}], data.masks[index]);
+
+        return Object.assign({}, data, {values: values, positions: null, masks: null});
+    }
+
     function updateRanges(info) {
         getRanges().forEach(range => {
             const axis = range.dataset.axis,
@@ -473,7 +574,7 @@ function hookVisualization(element) {
             if (urlShapes)
                 plot = plot.trace(urlShapes);
 
-            plot = plot.trace(url);
+            plot = plot.trace(state.section && !state.distance ? sectionData(state) : url);
 
             if (state.section)
                 plot = plot.relayout(layoutRanges)
@@ -508,6 +609,7 @@ function hookVisualization(element) {
             input.value = "";
 
             range.addEventListener('change', e => {
+                scrubAxis = a.order;
                 updateVino(info);
             });
             range.addEventListener('input', e => {
@@ -1,3 +1,514 @@
-from django.test import TestCase
+import io
+import os
+import signal
+import shutil
+import tempfile
+import threading
+import contextlib
 
-# Create your tests here.
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import vino as vn
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import Resolver404, resolve
+
+from .cache import DataCache, DerivedCache, data_cache, derived_cache, distance_options
+from .converters import PositiveIntRangeTupleConverter
+from .management.commands.runjobs import work
+from vino.core.statements import Equations, Inequations
+
+from .models import Kernel, SourceFile, ImportJob, ViabilityProblem
+from .models.datafile import lod_path, metadata_path, sources_hash
+from .utils import media_save_hashed
+
+
+SAMPLES_PATH = Path(__file__).resolve().parents[2] / 'samples'
+LAKE_FILES = ('lake/lake_Isa_R1.dat', 'lake/lake_Isa_R1.txt')
+
+
+@contextlib.contextmanager
+def open_samples(*paths):
+    with contextlib.ExitStack() as stack:
+        yield [
+            File(stack.enter_context(open(SAMPLES_PATH / p, 'rb')), name=Path(p).name)
+            for p in paths
+        ]
+
+
+def lake_bars(ppa):
+    """Small bar grid resampled from the lake sample."""
+    return vn.load(SAMPLES_PATH / 'lake/2D_light.txt', SAMPLES_PATH / 'lake/2D_light_metadata.txt').to_bargrid(ppa=ppa)
+
+
+class MediaTestCase(TestCase):
+    """Test case whose media files are stored in a temporary directory."""
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(data_cache.clear)
+
+        media_settings = override_settings(MEDIA_ROOT=str(self.media_root))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        # Imported kernels reuse this viability problem, whose statements are
+        # already parsed
+        ViabilityProblem.objects.create(
+            title='Lake eutrophication',
+            dynamics=Equations("L'=u,P'=-b*P+L+r*P^q/(m^q+P^q)"),
+            controls=Inequations('u>=unin,u<=unax'),
+            constraints=Inequations('L>=Lmin,L<=Lmax,P<=Pmax'),
+            domain=Inequations('P>=0'),
+        )
+
+    def media_files(self):
+        return sorted(p for p in self.media_root.rglob('*') if p.is_file())
+
+    @staticmethod
+    def import_kernel(*paths):
+        with open_samples(*(paths or LAKE_FILES)) as files:
+            return Kernel.from_files(*files)
+
+    @staticmethod
+    def import_vino(vno):
+        data, metadata = io.BytesIO(), io.StringIO()
+        vn.save_npy(data, vno)
+        vn.save_metadata(metadata, vno.metadata)
+        return Kernel.from_files(
+            File(data, name='data.npy'),
+            File(io.BytesIO(metadata.getvalue().encode()), name='metadata.txt'))
+
+
+class DistanceOptionsTest(TestCase):
+    def test_distance_options(self):
+        self.assertEqual(distance_options('distance'), {})
+        self.assertEqual(distance_options('distance-taxicab'), {'method': 'taxicab'})
+        self.assertEqual(
+            distance_options('distance-euclidean-max8'),
+            {'method': 'euclidean', 'max_distance': 8})
+        self.assertEqual(distance_options('distance-max10'), {'max_distance': 10})
+
+        for weight in (None, 'distances', 'distance-manhattan', 'distance-max', 'distance-max0', 'distance-max08'):
+            self.assertIsNone(distance_options(weight), weight)
+
+
+class RangeConverterTest(TestCase):
+    def test_to_python(self):
+        converter = PositiveIntRangeTupleConverter()
+        self.assertEqual(converter.to_python('0-3+7,4'), ((0, 1, 2, 3, 7), (4,)))
+
+        count = PositiveIntRangeTupleConverter.MAX_COUNT
+        self.assertEqual(len(converter.to_python(f'1-{count}')[0]), count)
+        with self.assertRaises(ValueError):
+            converter.to_python(f'0-{count}')
+        with self.assertRaises(ValueError):
+            converter.to_python(f'1-{count}+0')
+
+    def test_oversized_range_not_found(self):
+        self.assertEqual(resolve('/api/vino/1/sections/0,1/0-9/').kwargs['at'], (tuple(range(10)),))
+        with self.assertRaises(Resolver404):
+            resolve('/api/vino/1/sections/0,1/0-999999999/')
+
+
+class VinoDetailViewTest(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kernel = self.import_kernel()
+        self.url = f'/api/vino/{self.kernel.pk}/info/'
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_etag_changes_with_title(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.kernel.title = 'Renamed kernel'
+        self.kernel.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Renamed kernel')
+
+    def test_bars_without_resampling(self):
+        bars = lake_bars(33)
+
+        for vno in (bars, bars.to_regulargrid()):
+            kernel = self.import_vino(vno)
+            response = self.client.get(f'/api/vino/{kernel.pk}/regulargrid/0/bars/')
+            self.assertEqual(response.status_code, 200)
+
+            data = response.json()
+            self.assertEqual(data['baraxis'], bars.baraxis)
+            self.assertEqual(data['bars'], [bars[:, c].tolist() for c in range(bars.shape[1])])
+
+        # Kd-trees have no grid to keep
+        response = self.client.get(f'/api/vino/{self.kernel.pk}/regulargrid/0/bars/')
+        self.assertIn('error', response.json())
+
+
+class VinoSectionTest(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        ViabilityProblem.objects.create(
+            title='4D-cylinder',
+            dynamics=Equations("x'=x+a*u_x,y'=y+a*u_y,z'=z+a*u_z,t'=0"),
+            controls=Inequations('u_x^2+u_y^2+u_z^2<=1'),
+            constraints=Inequations('x^2+y^2+z^2<=r'),
+        )
+        self.kernel = self.import_kernel('4d/4d_cylinder_data.txt', '4d/4d_cylinder_metadata.txt')
+
+    def test_weighted_section(self):
+        url = f'/api/vino/{self.kernel.pk}/regulargrid+distance/9/section/0,1/4,2/'
+        data = self.client.get(url).json()
+
+        self.assertEqual(data['format'], 'regulargrid')
+        self.assertEqual(len(data['values']), 2)
+        self.assertEqual(len(data['distances']['values']), len(data['values'][0]))
+        self.assertTrue(all(d > 0 for d in data['distances']['values']))
+
+        # Distances are cut from the weighted grid only, bars aren't derived
+        entries = sorted(path.stem for _, _, path in derived_cache.entries())
+        self.assertEqual(entries, [f'regulargrid_9_distance-{settings.DISTANCE_DTYPE}', 'regulargrid_9_none'])
+
+
+class SourceFileTest(MediaTestCase):
+    def save_samples(self):
+        with open_samples(*LAKE_FILES) as files:
+            return [media_save_hashed(SourceFile.FILE_PATH, f) for f in files]
+
+    def test_media_save_hashed(self):
+        paths = self.save_samples()
+
+        self.assertEqual(self.save_samples(), paths)
+        self.assertEqual(self.media_files(), sorted(map(Path, paths)))
+        for path, sample in zip(paths, LAKE_FILES):
+            self.assertEqual(Path(path).read_bytes(), (SAMPLES_PATH / sample).read_bytes())
+
+    def test_from_media(self):
+        kernel = self.import_kernel()
+        sourcefiles = SourceFile.from_media(self.save_samples())
+
+        self.assertEqual(SourceFile.objects.count(), 2)
+        self.assertEqual(
+            sorted(sf.pk for sf in sourcefiles),
+            sorted(kernel.sourcefiles.values_list('pk', flat=True)))
+
+    def test_orphans(self):
+        kernel = self.import_kernel()
+        job = ImportJob.objects.create()
+        job.sourcefiles.add(*kernel.sourcefiles.all())
+
+        refcounts = SourceFile.objects.with_refcount().values_list('refcount', flat=True)
+        self.assertEqual(list(refcounts), [2, 2])
+        self.assertFalse(SourceFile.objects.orphans().exists())
+
+        # Source files of a pending import job aren't orphans
+        kernel.delete()
+        self.assertFalse(SourceFile.objects.orphans().exists())
+
+        job.status = ImportJob.DONE
+        job.save()
+        self.assertEqual(SourceFile.objects.orphans().count(), 2)
+
+    def test_cleanfiles(self):
+        kernel = self.import_kernel()
+        orphan = Path(default_storage.path('import/orphan.txt'))
+        orphan.write_text('orphan')
+
+        call_command('cleanfiles', force=True, stdout=io.StringIO())
+
+        expected = [Path(default_storage.path(sf.file)) for sf in kernel.sourcefiles.all()]
+        expected += [Path(kernel.datafile.path), metadata_path(kernel.datafile.path)]
+        self.assertFalse(orphan.exists())
+        self.assertTrue(all(p.exists() for p in expected))
+
+
+class ImportJobTest(MediaTestCase):
+    logger = 'vino.sharekernel.models.importjob'
+
+    def submit(self, *paths):
+        with open_samples(*(paths or LAKE_FILES)) as files:
+            return ImportJob.submit(*files)
+
+    def test_claim_and_run(self):
+        job = self.submit()
+
+        claimed = ImportJob.claim('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, ImportJob.RUNNING)
+        self.assertIsNone(ImportJob.claim('worker-2'))
+
+        claimed.run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertIsNotNone(job.kernel)
+
+    def test_run_failure(self):
+        job = self.submit(LAKE_FILES[1])
+
+        with self.assertLogs(self.logger, 'ERROR'):
+            ImportJob.claim('worker').run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertTrue(job.error)
+        self.assertIsNone(job.kernel)
+
+    def test_retry(self):
+        failed = self.submit(LAKE_FILES[1])
+        with self.assertLogs(self.logger, 'ERROR'):
+            ImportJob.claim('worker').run()
+        running = self.submit()
+        ImportJob.claim('worker')
+
+        failed.refresh_from_db()
+        running.refresh_from_db()
+        self.assertTrue(failed.retry())
+        self.assertEqual(failed.status, ImportJob.PENDING)
+        self.assertFalse(running.retry())
+
+        # Running jobs are retryable once stalled
+        with override_settings(IMPORT_JOB_TIMEOUT=0):
+            self.assertTrue(running.retry())
+        self.assertEqual(ImportJob.objects.pending().count(), 2)
+
+    def test_run_claimed_again(self):
+        job = self.submit()
+        stalled = ImportJob.claim('worker-1')
+        with override_settings(IMPORT_JOB_TIMEOUT=0):
+            self.assertTrue(job.retry())
+        ImportJob.claim('worker-2')
+
+        # First worker result doesn't overwrite state of the new run
+        with self.assertLogs(self.logger, 'WARNING'):
+            stalled.run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.RUNNING)
+        self.assertEqual(job.worker, 'worker-2')
+
+    def test_runjobs_worker(self):
+        self.addCleanup(signal.signal, signal.SIGINT, signal.getsignal(signal.SIGINT))
+        jobs = [self.submit(), self.submit(LAKE_FILES[1])]
+
+        with self.assertLogs(self.logger, 'ERROR'):
+            work(threading.Event(), poll_interval=0, once=True)
+        for job in jobs:
+            job.refresh_from_db()
+        self.assertEqual([job.status for job in jobs], [ImportJob.DONE, ImportJob.FAILED])
+        self.assertFalse(ImportJob.objects.unfinished().exists())
+
+
+class MakeDatafilesTest(MediaTestCase):
+    def makedatafiles(self, **options):
+        out = io.StringIO()
+        call_command('makedatafiles', stdout=out, **options)
+        return out.getvalue()
+
+    def test_sources_hash(self):
+        kernel = self.import_kernel()
+        files = [sf.file for sf in kernel.sourcefiles.all()]
+
+        self.assertEqual(kernel.source_hash, sources_hash(files))
+        self.assertEqual(sources_hash(files[::-1]), sources_hash(files))
+
+        # Files stored by content aren't read
+        for path in files:
+            Path(default_storage.path(path)).unlink()
+        self.assertEqual(sources_hash(files), kernel.source_hash)
+
+    def test_write_datafile(self):
+        # Temporary files are written next to datafiles, not in system
+        # temporary directory
+        with mock.patch('tempfile.tempdir', str(self.media_root / 'missing')):
+            kernel = self.import_kernel()
+
+        datafile = Path(kernel.datafile.path)
+        self.assertEqual(
+            self.media_files(),
+            sorted([datafile, metadata_path(datafile), lod_path(datafile)]
+                   + [Path(default_storage.path(sf.file)) for sf in kernel.sourcefiles.all()]))
+
+    def test_skip_unchanged(self):
+        kernel = self.import_kernel()
+        datafile = kernel.datafile.name
+
+        self.assertIn("Skip 1 unchanged kernels, make datafile for 0", self.makedatafiles())
+        self.assertIn("Skip 0 unchanged kernels, make datafile for 1", self.makedatafiles(force=True))
+
+        Kernel.objects.filter(pk=kernel.pk).update(source_hash='')
+        self.assertIn("make datafile for 1", self.makedatafiles())
+        kernel.refresh_from_db()
+        self.assertEqual(kernel.datafile.name, datafile)
+        self.assertEqual(kernel.source_hash, sources_hash([sf.file for sf in kernel.sourcefiles.all()]))
+
+
+class DerivedCacheTest(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kernel = self.import_kernel()
+
+    def test_key(self):
+        self.assertEqual(DerivedCache.key('regulargrid', None, None), 'regulargrid_none_none')
+        self.assertEqual(DerivedCache.key('bargrid', (10, 20), None), 'bargrid_10-20_none')
+        self.assertEqual(DerivedCache.key('hull', np.array([8, 8]), None), 'hull_8-8_none')
+        self.assertEqual(
+            DerivedCache.key('regulargrid', 16, 'distance-max4'),
+            f'regulargrid_16_distance-max4-{settings.DISTANCE_DTYPE}')
+
+        # Distances stored with another type are other entries
+        with override_settings(DISTANCE_DTYPE='uint8'):
+            self.assertEqual(
+                DerivedCache.key('regulargrid', 16, 'distance'), 'regulargrid_16_distance-uint8')
+
+    def test_get(self):
+        path = derived_cache.path(self.kernel, 'bargrid', 20, None)
+        self.assertEqual(path.parent, derived_cache.root / Path(self.kernel.datafile.name).stem)
+
+        bars = derived_cache.get(self.kernel, 'bargrid', 20)
+        self.assertTrue(path.exists())
+        self.assertTrue(path.with_suffix(DerivedCache.METADATA_SUFFIX).exists())
+        self.assertEqual(list(bars.ppa), [20, 20])
+
+        # Stored entries are loaded again, not derived
+        with mock.patch('vino.sharekernel.cache.derive') as derive:
+            self.assertTrue(np.array_equal(derived_cache.get(self.kernel, 'bargrid', 20), bars))
+        derive.assert_not_called()
+
+    def test_invalidate_on_set_datafile(self):
+        derived_cache.get(self.kernel, 'bargrid', 20)
+        directory = derived_cache.directory(self.kernel.datafile.name)
+
+        self.kernel.set_datafile(Path(self.kernel.datafile.path))
+        self.assertTrue(directory.exists())
+
+        self.kernel.set_datafile(Path(default_storage.path('kernels/other.npy')))
+        self.assertFalse(directory.exists())
+
+    def test_evict(self):
+        for ppa in (10, 20, 30):
+            derived_cache.get(self.kernel, 'bargrid', ppa)
+        paths = {ppa: derived_cache.path(self.kernel, 'bargrid', ppa, None) for ppa in (10, 20, 30)}
+
+        # Entries are used from oldest to newest: 20, 10 then 30
+        for age, ppa in enumerate((20, 10, 30)):
+            os.utime(paths[ppa], ns=(age * 10**9, paths[ppa].stat().st_mtime_ns))
+        # Loading an entry marks it as used
+        derived_cache.get(self.kernel, 'bargrid', 20)
+
+        entries = derived_cache.entries()
+        total = sum(size for _, size, _ in entries)
+        self.assertEqual(len(entries), 3)
+
+        with override_settings(DERIVED_CACHE_MAX_SIZE=total - 1):
+            derived_cache.evict()
+        self.assertEqual([ppa for ppa, path in paths.items() if path.exists()], [20, 30])
+        self.assertFalse(paths[10].with_suffix(DerivedCache.METADATA_SUFFIX).exists())
+
+        with override_settings(DERIVED_CACHE_MAX_SIZE=0):
+            derived_cache.evict()
+        self.assertEqual(derived_cache.entries(), [])
+
+
+class DataCacheTest(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = DataCache()
+        self.loads = []
+
+    def save(self, name, vno):
+        path = self.directory / f'{name}.npy'
+        with open(path, 'wb') as f:
+            vn.save_npy(f, vno)
+        with open(path.with_suffix('.txt'), 'w') as f:
+            vn.save_metadata(f, vno.metadata)
+        return path
+
+    def load(self, path):
+        self.loads.append(path.name)
+        return vn.load(path, path.with_suffix('.txt'))
+
+    def test_get(self):
+        path = self.save('bars', lake_bars(20))
+
+        vno = self.cache.get(path, self.load)
+        self.assertIs(self.cache.get(path, self.load), vno)
+        self.assertEqual(self.loads, ['bars.npy'])
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual((stats['entries'], stats['size']), (1, vno.nbytes))
+
+        # Cached vinos are shared, they can't be modified
+        self.assertFalse(vno.flags.writeable)
+        with self.assertRaises(ValueError):
+            vno[0, 0] = 1
+
+    def test_reload_changed_file(self):
+        path = self.save('bars', lake_bars(20))
+        vno = self.cache.get(path, self.load)
+
+        # Files of same size are reloaded once modified
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(self.cache.get(path, self.load), vno)
+
+        self.save('bars', lake_bars(30))
+        self.assertEqual(list(self.cache.get(path, self.load).ppa), [30, 30])
+        self.assertEqual(self.loads, ['bars.npy'] * 3)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_evict(self):
+        paths = [self.save(name, lake_bars(20)) for name in 'abc']
+        nbytes = self.cache.get(paths[0], self.load).nbytes
+
+        with override_settings(DATA_CACHE_MAX_SIZE=2.5 * nbytes):
+            self.cache.get(paths[1], self.load)
+            self.cache.get(paths[0], self.load)
+            # Least recently used vino is evicted
+            self.cache.get(paths[2], self.load)
+            self.assertEqual(self.cache.stats()['evictions'], 1)
+            self.assertEqual(self.cache.size, 2 * nbytes)
+
+            self.cache.get(paths[0], self.load)
+            self.cache.get(paths[1], self.load)
+        self.assertEqual(self.loads, ['a.npy', 'b.npy', 'c.npy', 'b.npy'])
+
+        # Vinos larger than the cache aren't kept
+        with override_settings(DATA_CACHE_MAX_SIZE=nbytes - 1):
+            self.cache.clear()
+            self.cache.get(paths[0], self.load)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_stats_view(self):
+        self.addCleanup(data_cache.clear)
+        path = self.save('bars', lake_bars(20))
+        data_cache.get(path, self.load, key='test')
+        data_cache.get(path, self.load, key='test')
+
+        self.assertEqual(self.client.get('/api/cache/').status_code, 302)
+
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get('/api/cache/').json()
+        self.assertEqual(stats['pid'], os.getpid())
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['entries'], 1)
+        self.assertEqual(
+            set(stats), {'entries', 'size', 'max_size', 'hits', 'misses', 'evictions', 'pid'})
@@ -1,13 +1,16 @@
 from django.urls import path, include, register_converter
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import TemplateView
 
-from .converters import PositiveIntTupleConverter
-from .views import (HomeView, ExploreView, ViabilityProblemView,
-                    VinoData, VinoShapes, VinoSection)
+from .converters import PositiveIntTupleConverter, PositiveIntRangeTupleConverter, DistanceWeightConverter
+from .views import (HomeView, ExploreView, ViabilityProblemView, KernelCsvView,
+                    VinoData, VinoShapes, VinoSection, VinoSections, CacheStats)
 
 
 register_converter(PositiveIntTupleConverter, 'ints')
+register_converter(PositiveIntRangeTupleConverter, 'ranges')
+register_converter(DistanceWeightConverter, 'distance')
 
 urlpatterns = [
     # ∙∙ Website pages
@@ -15,6 +18,7 @@ urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('explore', ExploreView.as_view(), name='explore'),
     path('viabilityproblem/<int:pk>/', ViabilityProblemView.as_view(), name='viabilityproblem'),
+    path('kernel/<int:pk>/csv', KernelCsvView.as_view(), name='kernel_csv'),
     path('about', TemplateView.as_view(template_name='sharekernel/about.html'), name='about'),
 
     # ∙∙ Web API endpoints
@@ -26,7 +30,12 @@ urlpatterns = [
     # -- Coerced vino
     path('api/vino/<int:pk>/bargrid/<ints:ppa>/', VinoData.as_view(format='bargrid'), name='vino_data'),
     path('api/vino/<int:pk>/regulargrid/<ints:ppa>/', VinoData.as_view(format='regulargrid'), name='vino_data'),
-    path('api/vino/<int:pk>/regulargrid+distance/<ints:ppa>/', VinoData.as_view(format='regulargrid', weight='distance'), name='vino_data'),
+    path('api/vino/<int:pk>/regulargrid+<distance:weight>/<ints:ppa>/', VinoData.as_view(format='regulargrid'), name='vino_data'),
+
+    # -- Compact encodings of coerced vino
+    path('api/vino/<int:pk>/regulargrid/<ints:ppa>/mask/', VinoData.as_view(format='regulargrid', encoding='mask'), name='vino_data'),
+    path('api/vino/<int:pk>/regulargrid/<ints:ppa>/bars/', VinoData.as_view(format='regulargrid', encoding='bars'), name='vino_data'),
+    path('api/vino/<int:pk>/regulargrid+<distance:weight>/<ints:ppa>/mask/', VinoData.as_view(format='regulargrid', encoding='mask'), name='vino_data'),
 
     # -- Shapes of a vino
     path('api/vino/<int:pk>/shapes/', VinoShapes.as_view(), name='vino_shapes'),
@@ -35,7 +44,14 @@ urlpatterns = [
     # -- Section of a vino
     path('api/vino/<int:pk>/section/<ints:plane>/<ints:at>/', VinoSection.as_view(), name='vino_section'),
     path('api/vino/<int:pk>/regulargrid/<ints:ppa>/section/<ints:plane>/<ints:at>/', VinoSection.as_view(), name='vino_section'),
-    path('api/vino/<int:pk>/regulargrid+distance/<ints:ppa>/section/<ints:plane>/<ints:at>/', VinoSection.as_view(weight='distance'), name='vino_section'),
+    path('api/vino/<int:pk>/regulargrid+<distance:weight>/<ints:ppa>/section/<ints:plane>/<ints:at>/', VinoSection.as_view(), name='vino_section'),
+
+    # -- Stack of sections of a vino
+    path('api/vino/<int:pk>/sections/<ints:plane>/<ranges:at>/', VinoSections.as_view(), name='vino_sections'),
+    path('api/vino/<int:pk>/regulargrid/<ints:ppa>/sections/<ints:plane>/<ranges:at>/', VinoSections.as_view(), name='vino_sections'),
+
+    # -- Statistics of loaded vinos cache
+    path('api/cache/', staff_member_required(CacheStats.as_view()), name='cache_stats'),
 ]
 
 
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import io
 import os
+import re
 import hashlib
 
 from pathlib import Path
-from typing import Union, Iterable, IO, AnyStr
+from tempfile import NamedTemporaryFile
+from typing import Union, Iterable, IO
 
+from django.core.files import File
 from django.core.files.storage import default_storage
 
 from ..typing import AnyPath
@@ -18,22 +22,76 @@ def sorted_by_size(files: Iterable[StringPath]) -> list[StringPath]:
     return sorted(files, key=lambda f: Path(f).stat().st_size)
 
 
-def media_save(path: str, file: IO[AnyStr]) -> str:
-    name = default_storage.save(Path(path) / Path(file.name).name, file)
-    return default_storage.path(name)
+def media_save_hashed(path: str, file: IO[bytes]) -> str:
+    """Save `file` in a subdirectory of `path` named after the sha256 hash of
+    its content, and return its absolute path. A content already saved is
+    only hashed and never stored twice: path of stored file is returned.
+    """
+    directory = Path(default_storage.path(path))
+    directory.mkdir(parents=True, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    with NamedTemporaryFile(mode='wb', dir=directory, delete=False) as tmp:
+        writer = HashingWriter(tmp, hasher)
+        for chunk in File(file).chunks():
+            writer.write(chunk)
+    digest = hasher.hexdigest()
+
+    stored = directory / digest[:2] / digest
+    stored.mkdir(parents=True, exist_ok=True)
+    for existing in stored.iterdir():
+        os.unlink(tmp.name)
+        return str(existing)
+
+    target = stored / Path(file.name).name
+    os.chmod(tmp.name, 0o0644)
+    os.replace(tmp.name, target)
+    return str(target)
+
+
+def stored_hash(path: AnyPath) -> str:
+    """Sha256 hash of the content of file at `path`, taken from its path if
+    it was saved by `media_save_hashed`, computed otherwise."""
+    directory = Path(os.fsdecode(path)).parent
+    digest = directory.name
+    if re.fullmatch('[0-9a-f]{64}', digest) and directory.parent.name == digest[:2]:
+        return digest
+    return hash_files(path, algorithm='sha256')
 
 
 def media_relative_path(path: Path) -> str:
     return path.relative_to(default_storage.location).as_posix()
 
 
-def hash_file(path: AnyPath, algorithm: str = 'sha1', chunk_size: int = 1024*1024) -> str:
+def hash_files(*paths: AnyPath, algorithm: str = 'sha1', chunk_size: int = 1024*1024) -> str:
+    """Hash concatenated content of files found at `paths`."""
     assert algorithm in hashlib.algorithms_guaranteed, f"Can't find {algorithm} algorithm"
     hasher = getattr(hashlib, algorithm)()
-    with open(path, 'rb', buffering=0) as fp:
-        while True:
-            chunk = fp.read(chunk_size)
-            if not chunk:
-                break
-            hasher.update(chunk)
+    for path in paths:
+        with open(path, 'rb', buffering=0) as fp:
+            while True:
+                chunk = fp.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
     return hasher.hexdigest()
+
+
+class HashingWriter(io.RawIOBase):
+    """Binary file wrapper hashing data written through it with `hasher`, so
+    that a file can be named after its hash without reading it back."""
+    def __init__(self, file: IO[bytes], hasher) -> None:
+        super().__init__()
+        self.file = file
+        self.hasher = hasher
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.hasher.update(data)
+        return self.file.write(data)
+
+
+def hash_file(path: AnyPath, algorithm: str = 'sha1', chunk_size: int = 1024*1024) -> str:
+    return hash_files(path, algorithm=algorithm, chunk_size=chunk_size)
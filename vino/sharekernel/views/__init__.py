@@ -1,8 +1,8 @@
-from .main import HomeView, ExploreView, ViabilityProblemView
-from .api import VinoData, VinoShapes, VinoSection
+from .main import HomeView, ExploreView, ViabilityProblemView, KernelCsvView
+from .api import VinoData, VinoShapes, VinoSection, VinoSections, CacheStats
 
 
 __all__ = [
-    'HomeView', 'ExploreView', 'ViabilityProblemView',
-    'VinoData', 'VinoShapes', 'VinoSection',
+    'HomeView', 'ExploreView', 'ViabilityProblemView', 'KernelCsvView',
+    'VinoData', 'VinoShapes', 'VinoSection', 'VinoSections', 'CacheStats',
 ]
@@ -1,11 +1,22 @@
+import os
+import hashlib
+
+from itertools import product
+
 import numpy as np
 import vino as vn
 
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from django.views.generic import View
+
+from ..cache import data_cache
 from ..models import Kernel
-from .json import JsonDetailView
+from .json import NegotiatedDetailView, JsonResponseMixin
 
 
-def info_from_vino(kernel, vno, original=None, axes=None):
+def info_from_vino(kernel, vno, resampled=False, axes=None):
     dim = vno.dim
     ranges = vno.bounds.T.tolist()
     info = dict(
@@ -28,10 +39,10 @@ def info_from_vino(kernel, vno, original=None, axes=None):
         ]
     )
 
-    if original is not None:
+    if resampled:
         info['original'] = dict(
-            format=original.DATAFORMAT,
-            size=original.count,
+            format=str(kernel.format),
+            size=kernel.size,
         )
 
     if isinstance(vno, vn.RegularGrid):
@@ -52,8 +63,66 @@ def error(msg):
     }
 
 
-class VinoDetailView(JsonDetailView):
+def section_error(dim, plane, at):
+    """Error message if sections along `plane` at `at` positions can't be cut
+    from a `dim`-dimensional vino, if any."""
+    if dim < 3:
+        return f"Can't make sections from a {dim}-dimensional vino"
+
+    if len(plane) != 2:
+        return "Please provide 2 axes to define the cutting plane"
+
+    m = dim - len(plane)
+    if len(at) != m:
+        return f"Please provide {m} ax{'i' if m == 1 else 'e'}s to specify section position"
+
+    for a in plane:
+        if a not in range(dim):
+            return f"Cutting plane axes must be between 0 and {dim-1}"
+
+    return None
+
+
+def section_grid(kernel, ppa, plane, weight=None):
+    """Grid to cut sections of `kernel` resampled with `ppa` and weighted by
+    `weight` from, and its info. Unweighted kernels which aren't regular
+    grids are cut from their bars rather than from a whole regular grid, see
+    `BarGrid.section`, but look the same as regular grids."""
+    if weight is not None or str(kernel.format) == vn.RegularGrid.DATAFORMAT:
+        vno = kernel.derived('regulargrid', ppa, weight)
+        return vno, info_from_vino(kernel, vno, True, plane)
+
+    bars = kernel.derived('bargrid', ppa)
+    info = info_from_vino(kernel, bars, True, plane)
+    info.update(format=vn.RegularGrid.DATAFORMAT, size=int(np.prod(bars.ppa)))
+    return bars, info
+
+
+class CacheStats(JsonResponseMixin, View):
+    """Statistics of the loaded vinos cache of the process serving request,
+    useful to size ``DATA_CACHE_MAX_SIZE`` for each worker."""
+    def get(self, request, *args, **kwargs):
+        return self.render_to_json_response(dict(data_cache.stats(), pid=os.getpid()))
+
+
+# Bump it when responses change for a same datafile, to invalidate caches
+API_VERSION = 3
+
+
+class VinoDetailView(NegotiatedDetailView):
+    """
+    Detail view of kernel data, which supports conditional requests.
+
+    Responses depend on kernel datafile -- whose name embeds its hash, see
+    `write_datafile` --, on fields of the kernel and of its viability problem
+    such as their title -- tracked by their update date -- and on request
+    parameters, so that the ETag is computed from them without loading data.
+    Responses are public so that frontend and browsers can cache them for
+    ``API_CACHE_MAX_AGE`` seconds.
+    """
     model = Kernel
+    # View attributes set by URLs, which select response content
+    parameters = ('info_only', 'format', 'weight', 'encoding')
 
     def get_ppa(self):
         ppa = self.kwargs.get('ppa')
@@ -69,44 +138,106 @@ class VinoDetailView(JsonDetailView):
     def setup(self, request, *args, **kwargs):
         super().setup(request, *args, **kwargs)
         self.ppa = self.get_ppa()
+        # Weight is selected by URLs path, see `DistanceWeightConverter`
+        if 'weight' in kwargs:
+            self.weight = kwargs['weight']
+
+    def get_object(self, queryset=None):
+        # Kernel is fetched before rendering to check preconditions
+        if queryset is None and getattr(self, 'object', None) is not None:
+            return self.object
+        return super().get_object(queryset)
+
+    def get_etag(self, kernel):
+        response_class = self.get_response_class()
+        key = repr((
+            API_VERSION,
+            type(self).__name__,
+            kernel.datafile.name,
+            kernel.date_updated.isoformat(),
+            kernel.vp.date_updated.isoformat(),
+            response_class and response_class.content_type,
+            [getattr(self, p, None) for p in self.parameters],
+            sorted(self.kwargs.items()),
+        ))
+        return quote_etag(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+    def get_last_modified(self, kernel):
+        dates = [kernel.date_updated.timestamp(), kernel.vp.date_updated.timestamp()]
+        try:
+            dates.append(os.stat(kernel.datafile.path).st_mtime)
+        except (OSError, ValueError):
+            pass
+        return int(max(dates))
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        etag = self.get_etag(self.object)
+        last_modified = self.get_last_modified(self.object)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+            patch_vary_headers(response, ('Accept',))
+
+        return response
 
 
 class VinoData(VinoDetailView):
     info_only = False
     format = None
     weight = None
+    encoding = None
 
     def get_context_data(self, **kwargs):
         kernel = self.get_object()
-        vno = kernel.data
-        original = None
+        dim = kernel.dimension
 
-        if not self.info_only and vno.dim > 3:
+        if not self.info_only and dim > 3:
             return error(
-                f"Can't visualize {vno.dim}-dimensional vino, use sections")
-
-        if self.ppa is not None:
-            original = vno
-
-            if self.format == 'regulargrid':
-                vno = vno.to_regulargrid(ppa=self.ppa)
-            else:
-                vno = vno.to_bargrid(ppa=self.ppa)
-
-        info = info_from_vino(kernel, vno, original)
+                f"Can't visualize {dim}-dimensional vino, use sections")
+
+        resampled = self.ppa is not None
+        if resampled:
+            target = 'regulargrid' if self.format == 'regulargrid' else 'bargrid'
+            try:
+                vno = kernel.derived(target, self.ppa)
+            except ValueError as e:
+                return error(str(e))
+        else:
+            vno = kernel.data
+
+        info = info_from_vino(kernel, vno, resampled)
         if self.info_only:
             return info
 
+        if self.weight is not None:
+            distances = kernel.derived('regulargrid', self.ppa, self.weight)
+            info['distances'] = dict(
+                values=distances.weights(),
+            )
+
+        # Compact encodings of regular grid, clients rebuild points
+        # coordinates from grid origin and unit
+        if self.encoding == 'mask':
+            return dict(info, mask=vno.packed_mask())
+        if self.encoding == 'bars':
+            bars = kernel.derived('bargrid', self.ppa)
+            return dict(info, baraxis=bars.baraxis, bars=[
+                np.ascontiguousarray(bars[:, c]) for c in range(bars.shape[1])
+            ])
+
         if vno.dim == 3 and isinstance(vno, vn.BarGrid):
-            vno = vno.hull()
+            vno = kernel.derived('hull', self.ppa)
 
         data = vno.points_coordinates()
 
         if type(vno) is vn.RegularGrid:
-            if self.weight == 'distance':
-                info['distances'] = dict(
-                    values=vno.distances(),
-                )
             if vno.has_weight():
                 info['weights'] = dict(
                     values=vno.weights(),
@@ -124,14 +255,10 @@ class VinoShapes(VinoDetailView):
         if kernel.dimension != 2:
             return error("Only 2-dimensional vinos have shapes")
 
-        vno = kernel.data
-        original = None
-
-        if self.ppa is not None:
-            original = vno
-            vno = vno.to_bargrid(ppa=self.ppa)
+        resampled = self.ppa is not None
+        vno = kernel.derived('bargrid', self.ppa) if resampled else kernel.data
 
-        info = info_from_vino(kernel, vno, original)
+        info = info_from_vino(kernel, vno, resampled)
         rectangles = vno.rectangles_coordinates()
 
         return dict(info, shapes=[
@@ -145,50 +272,70 @@ class VinoSection(VinoDetailView):
     def get_context_data(self, **kwargs):
         kernel = self.get_object()
 
-        dim = kernel.dimension
-        if dim < 3:
-            return error(f"Can't make sections from a {dim}-dimensional vino")
-
         plane = self.kwargs.get('plane')
         at = self.kwargs.get('at')
 
-        if len(plane) != 2:
-            return error("Please provide 2 axes to define the cutting plane")
-
-        m = dim - len(plane)
-        if len(at) != m:
-            return error(
-                f"Please provide {m} ax{'i' if m == 1 else 'e'}s to specify section position")
+        msg = section_error(kernel.dimension, plane, at)
+        if msg is not None:
+            return error(msg)
 
-        for a in plane:
-            if a not in range(dim):
-                return error(f"Cutting plane axes must be between 0 and {dim-1}")
-
-        vno = original = kernel.data
-        if type(vno) is not vn.RegularGrid or (self.ppa is not None and np.any(self.ppa != vno.ppa)):
-            vno = original.to_regulargrid(ppa=self.ppa)
-        info = info_from_vino(kernel, vno, original, plane)
-
-        if self.weight == 'distance':
-            vno = vno.with_distance()
+        vno, info = section_grid(kernel, self.ppa, plane, self.weight)
 
         section = vno.section(plane, at).ravel()
-        mask = section if self.weight is None and not vno.has_weight() else (section > 0)
-        coordinates = vno.grid_coordinates(plane)
-        points = coordinates[mask]
-
-        if self.weight == 'distance':
-            info['distances'] = dict(
-                range=[np.min(vno.ravel()).item(), np.max(vno.ravel()).item()],
-                values=np.asarray(section[mask]),
-            )
-
-        if vno.has_weight():
-            info['weights'] = dict(
-                range=[np.min(vno.ravel()).item(), np.max(vno.ravel()).item()],
-                values=np.asarray(section[mask]),
+        weighted = type(vno) is vn.RegularGrid and vno.has_weight()
+        mask = (section > 0) if weighted else section
+        points = vno.grid_coordinates(plane, np.flatnonzero(mask))
+
+        if weighted:
+            weights = dict(
+                range=list(vno.weight_range()),
+                values=vno.unquantize(section[mask]),
             )
+            info['weights'] = weights
+            if self.weight is not None:
+                info['distances'] = weights
 
         return dict(info, values=[
             np.ascontiguousarray(points[:, a]) for a in range(len(plane))
         ])
+
+
+class VinoSections(VinoDetailView):
+    """
+    Stack of sections along a same plane, at every combination of the
+    positions given for each other axis -- see `PositiveIntRangeTupleConverter`
+    -- so that clients scrub through sections with a single request.
+
+    Sections are cut at once from the same grid and sent as masks of grid
+    cells along plane axes, packed like regular grid ``mask`` encoding.
+    """
+    max_sections = 4096
+
+    def get_context_data(self, **kwargs):
+        kernel = self.get_object()
+
+        plane = self.kwargs.get('plane')
+        at = self.kwargs.get('at')
+
+        msg = section_error(kernel.dimension, plane, at)
+        if msg is not None:
+            return error(msg)
+
+        count = np.prod([len(positions) for positions in at], dtype=int)
+        if not 0 < count <= self.max_sections:
+            return error(f"Please provide between 1 and {self.max_sections} section positions")
+
+        vno, info = section_grid(kernel, self.ppa, plane)
+        fixed = [a for a in range(kernel.dimension) if a not in plane]
+        positions = np.array(list(product(*at)), dtype=int)
+
+        if np.any(positions >= vno.ppa[fixed]):
+            return error("Section positions must be inside the grid")
+
+        sections = vno.sections(plane, positions).reshape(len(positions), -1)
+
+        return dict(
+            info,
+            positions=positions.tolist(),
+            masks=list(np.packbits(sections, axis=1, bitorder='little')),
+        )
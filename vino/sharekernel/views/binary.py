@@ -0,0 +1,126 @@
+"""
+Binary alternatives to JSON responses of the web API.
+
+One-dimensional numpy arrays found in response data -- such as coordinates
+columns -- are sent as raw little endian typed arrays, everything else stays
+in a JSON header where those arrays are replaced by ``{"$array": {...}}``
+references. Small arrays, such as grid ppa, are kept in JSON header.
+"""
+import struct
+
+import numpy as np
+import orjson
+
+from django.http import HttpResponse
+
+try:
+    import pyarrow as pa  # type: ignore
+except ImportError:
+    pa = None
+
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+
+# Binary response layout is: magic, header length, JSON header, arrays.
+# Header and arrays start on 8 bytes boundaries so that clients can view
+# them as typed arrays without copying.
+MAGIC = b'VNO1'
+PREFIX = struct.Struct('<4sI')
+ALIGNMENT = 8
+# Arrays smaller than this stay in JSON header
+MIN_SIZE = 64
+
+# Types JavaScript typed arrays can view, other types are converted
+JS_DTYPES = {
+    np.dtype(t) for t in (
+        np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32,
+        np.float32, np.float64,
+    )
+}
+
+
+def js_array(array):
+    """Convert `array` to a contiguous little endian array of a type which
+    JavaScript can view as a typed array."""
+    if array.dtype == np.bool_:
+        array = array.view(np.uint8)
+    elif array.dtype.newbyteorder('=') not in JS_DTYPES:
+        # 64 bits integers have no typed array counterpart but BigInt ones
+        array = array.astype(np.float64)
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+
+def padding(size):
+    return b' ' * (-size % ALIGNMENT)
+
+
+def extract_arrays(data, arrays):
+    """Replace one-dimensional arrays found in `data` by references to their
+    index in `arrays` list, which is filled along the way, and their offset
+    in binary response body."""
+    if isinstance(data, dict):
+        return {k: extract_arrays(v, arrays) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [extract_arrays(v, arrays) for v in data]
+    if isinstance(data, np.ndarray) and data.ndim == 1 and data.size >= MIN_SIZE:
+        offset = sum(a.nbytes + len(padding(a.nbytes)) for a in arrays)
+        array = js_array(data)
+        arrays.append(array)
+        return {'$array': dict(
+            index=len(arrays) - 1,
+            offset=offset,
+            dtype=array.dtype.name,
+            length=len(array),
+        )}
+    return data
+
+
+class BinaryResponse(HttpResponse):
+    """Arrays offsets are relative to the end of JSON header."""
+    content_type = 'application/octet-stream'
+
+    def __init__(self, data, **kwargs):
+        arrays = []
+        header = orjson.dumps(extract_arrays(data, arrays), option=ORJSON_OPTIONS)
+        header += padding(PREFIX.size + len(header))
+
+        chunks = [PREFIX.pack(MAGIC, len(header)), header]
+        for array in arrays:
+            chunks.extend((array.data, padding(array.nbytes)))
+
+        kwargs.setdefault('content_type', self.content_type)
+        super().__init__(content=b''.join(chunks), **kwargs)
+
+
+class ArrowResponse(HttpResponse):
+    """Arrow IPC stream with a single record batch of one row, each array is
+    a list column named after its index, the JSON header is stored in schema
+    metadata under ``vino`` key."""
+    content_type = 'application/vnd.apache.arrow.stream'
+
+    def __init__(self, data, **kwargs):
+        arrays = []
+        header = extract_arrays(data, arrays)
+
+        batch = pa.RecordBatch.from_arrays(
+            [pa.LargeListArray.from_arrays([0, len(a)], a) for a in arrays],
+            names=[str(i) for i in range(len(arrays))],
+        )
+        batch = batch.replace_schema_metadata({
+            b'vino': orjson.dumps(header, option=ORJSON_OPTIONS),
+        })
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+
+        kwargs.setdefault('content_type', self.content_type)
+        super().__init__(content=sink.getvalue().to_pybytes(), **kwargs)
+
+
+def available_responses():
+    """Binary response classes by media type, Arrow one needs pyarrow."""
+    responses = {BinaryResponse.content_type: BinaryResponse}
+    if pa is not None:
+        responses[ArrowResponse.content_type] = ArrowResponse
+    return responses
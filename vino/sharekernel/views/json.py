@@ -1,8 +1,11 @@
 import orjson
 
 from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from django.views.generic.detail import BaseDetailView
 
+from .binary import available_responses
+
 
 class JsonResponse(HttpResponse):
     def __init__(self, data, safe=True, json_dumps_params=None, **kwargs):
@@ -30,3 +33,43 @@ class JsonResponseMixin:
 class JsonDetailView(JsonResponseMixin, BaseDetailView):
     def render_to_response(self, context, **response_kwargs):
         return self.render_to_json_response(context, **response_kwargs)
+
+
+def accepted_media_types(accept):
+    """Media types listed in an HTTP Accept header, by decreasing quality."""
+    items = []
+    for position, item in enumerate(accept.split(',')):
+        media_type, *params = [p.strip() for p in item.split(';')]
+        quality = 1.
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.
+        if media_type and quality > 0:
+            items.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(items)]
+
+
+class NegotiatedDetailView(JsonDetailView):
+    """Detail view rendered as JSON by default, or in a binary format when
+    the request Accept header prefers one, see `binary` module."""
+    def get_response_class(self):
+        responses = available_responses()
+        for media_type in accepted_media_types(self.request.META.get('HTTP_ACCEPT', '')):
+            if media_type in ('application/json', '*/*', 'application/*'):
+                break
+            if media_type in responses:
+                return responses[media_type]
+        return None
+
+    def render_to_response(self, context, **response_kwargs):
+        response_class = self.get_response_class()
+        if response_class is None:
+            response = self.render_to_json_response(context, **response_kwargs)
+        else:
+            response = response_class(self.get_data(context), **response_kwargs)
+        patch_vary_headers(response, ('Accept',))
+        return response
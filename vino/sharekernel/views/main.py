@@ -1,6 +1,12 @@
 import json
 
+from pathlib import Path
+
+import vino as vn
+
+from django.http import HttpResponse
 from django.views.generic import TemplateView, ListView, DetailView
+from django.views.generic.detail import BaseDetailView
 from django.forms.models import model_to_dict
 from django.utils.safestring import mark_safe
 
@@ -51,3 +57,16 @@ class ViabilityProblemView(ModalMixin, DetailView):
     context_object_name = 'vp'
     queryset = ViabilityProblem.objects.active().with_dimensions()  # type: ignore
     template_name = 'sharekernel/viabilityproblem.html'
+
+
+class KernelCsvView(BaseDetailView):
+    """Export kernel data in RichCSV format."""
+    queryset = Kernel.objects.active()
+
+    def render_to_response(self, context, **response_kwargs):
+        kernel = self.object
+        filename = Path(kernel.datafile.name).stem + '.csv'
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        vn.save_csv(response, kernel.data)  # type: ignore
+        return response
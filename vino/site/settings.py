@@ -148,6 +148,32 @@ MEDIA_ROOT = Path(DATA_DIR, 'files').as_posix()
 DEFAULT_FILE_STORAGE = 'vino.sharekernel.storage.CustomFileSystemStorage'
 
 
+# Caches of kernels data (see vino.sharekernel.cache module)
+
+# Maximum size in bytes of loaded vinos kept in memory by each process
+DATA_CACHE_MAX_SIZE = settings.get('DATA_CACHE_MAX_SIZE', 256 * 1024**2)
+
+# Directory of derived data stored on disk, relative to MEDIA_ROOT
+DERIVED_CACHE_DIR = 'cache'
+# Maximum size in bytes, least recently used entries are evicted beyond it
+DERIVED_CACHE_MAX_SIZE = settings.get('DERIVED_CACHE_MAX_SIZE', 2 * 1024**3)
+# Type of stored distance grids: float32, or uint16 to quantize distances
+DISTANCE_DTYPE = settings.get('DISTANCE_DTYPE', 'float32')
+
+# Levels of detail precomputed at import, at power of two ppa between these
+# bounds, with at most LOD_MAX_CELLS cells
+LOD_MIN_PPA = settings.get('LOD_MIN_PPA', 32)
+LOD_MAX_PPA = settings.get('LOD_MAX_PPA', 1024)
+LOD_MAX_CELLS = settings.get('LOD_MAX_CELLS', 2**26)
+
+# Seconds after which a running import job is considered stalled, so that it
+# can be queued again from the admin
+IMPORT_JOB_TIMEOUT = settings.get('IMPORT_JOB_TIMEOUT', 6 * 3600)
+
+# Lifetime in seconds of web API responses in frontend and browsers caches
+API_CACHE_MAX_AGE = settings.get('API_CACHE_MAX_AGE', 3600)
+
+
 # Debug toolbar
 
 if settings.get('DEBUG_TOOLBAR'):